@@ -23,6 +23,7 @@
 from util import *
 import time
 import os
+import random
 import traceback
 import sys
 
@@ -79,12 +80,29 @@ class Configuration:
 
     The convention for positions, like a graph, is that (0,0) is the lower left corner, x increases
     horizontally and y increases vertically.  Therefore, north is the direction of increasing y, or (0,1).
+
+    Configurations are never changed once made, so game states share them;
+    generateSuccessor hands out interned instances (see intern).
     """
+    __slots__ = ('pos', 'direction')
 
     def __init__(self, pos, direction):
         self.pos = pos
         self.direction = direction
 
+    def intern(pos, direction):
+        """
+        Returns the shared Configuration with this position and direction.
+        """
+        x, y = pos
+        # 1 and 1.0 are equal keys, but the position keeps the type it was given
+        key = (x, y, direction, type(x), type(y))
+        configuration = _configurations.get(key)
+        if configuration is None:
+            configuration = _configurations[key] = Configuration(pos, direction)
+        return configuration
+    intern = staticmethod(intern)
+
     def getPosition(self):
         return (self.pos)
 
@@ -121,13 +139,19 @@ class Configuration:
         direction = Actions.vectorToDirection(vector)
         if direction == Directions.STOP:
             direction = self.direction  # There is no stop direction
-        return Configuration((x + dx, y+dy), direction)
+        return Configuration.intern((x + dx, y+dy), direction)
+
+
+# Interned configurations; agents only visit a few positions per layout
+_configurations = {}
 
 
 class AgentState:
     """
     AgentStates hold the state of an agent (configuration, speed, scared, etc).
     """
+    __slots__ = ('start', 'configuration', 'isPacman', 'scaredTimer',
+                 'numCarrying', 'numReturned')
 
     def __init__(self, startConfiguration, isPacman):
         self.start = startConfiguration
@@ -171,9 +195,15 @@ class AgentState:
 
 class Grid:
     """
-    A 2-dimensional array of objects backed by a list of lists.  Data is accessed
-    via grid[x][y] where (x,y) are positions on a Pacman map with x horizontal,
-    y vertical and the origin (0,0) in the bottom left corner.
+    A 2-dimensional array of booleans stored as the bits of a single int.
+    Data is accessed via grid[x][y] where (x,y) are positions on a Pacman map
+    with x horizontal, y vertical and the origin (0,0) in the bottom left
+    corner.  Cell (x,y) is bit x * height + y, so copying a grid is O(1),
+    count() is a popcount and the hash is computed once and cached.
+
+    A frozen grid (see freeze) is read-only.  Layouts freeze their grids so
+    that every game state can share them, and give their walls the tables
+    used by Actions.getPossibleActions and Actions.getLegalNeighbors.
 
     The __str__ method constructs an output that is oriented like a pacman board.
     """
@@ -185,19 +215,39 @@ class Grid:
 
         self.width = width
         self.height = height
-        self.data = [[initialValue for y in range(
-            height)] for x in range(width)]
+        self.bits = (1 << (width * height)) - 1 if initialValue else 0
+        self._hash = None
+        self._columns = None
+        self._frozen = False
+        # Wall grids of a Layout: (x, y) -> legal directions / neighbor cells
+        self.legalActions = None
+        self.legalNeighbors = None
         if bitRepresentation:
             self._unpackBits(bitRepresentation)
 
     def __getitem__(self, i):
-        return self.data[i]
+        columns = self._columns
+        if columns is None:
+            columns = self._columns = [None] * self.width
+        column = columns[i]
+        if column is None:
+            column = columns[i] = GridColumn(self, i % self.width)
+        return column
 
     def __setitem__(self, key, item):
-        self.data[key] = item
+        column = self[key]
+        for y in range(self.height):
+            column[y] = item[y]
+
+    def __len__(self):
+        return self.width
+
+    def __iter__(self):
+        for x in range(self.width):
+            yield self[x]
 
     def __str__(self):
-        out = [[str(self.data[x][y])[0] for x in range(self.width)]
+        out = [[str(self[x][y])[0] for x in range(self.width)]
                for y in range(self.height)]
         out.reverse()
         return '\n'.join([''.join(x) for x in out])
@@ -205,41 +255,46 @@ class Grid:
     def __eq__(self, other):
         if other == None:
             return False
-        return self.data == other.data
+        return self.bits == other.bits and self.width == other.width and self.height == other.height
 
     def __hash__(self):
-        # return hash(str(self))
-        base = 1
-        h = 0
-        for l in self.data:
-            for i in l:
-                if i:
-                    h += base
-                base *= 2
-        return hash(h)
+        if self._hash is None:
+            self._hash = hash(self.bits)
+        return self._hash
 
     def copy(self):
         g = Grid(self.width, self.height)
-        g.data = [x[:] for x in self.data]
+        g.bits = self.bits
+        g._hash = self._hash
         return g
 
     def deepCopy(self):
         return self.copy()
 
+    def freeze(self):
+        """
+        Makes the grid read-only; copies of it are writable again.
+        """
+        self._frozen = True
+
     def shallowCopy(self):
-        g = Grid(self.width, self.height)
-        g.data = self.data
-        return g
+        # The bits are an immutable int, so a copy shares them anyway
+        return self.copy()
 
     def count(self, item=True):
-        return sum([x.count(item) for x in self.data])
+        if item:
+            return self.bits.bit_count()
+        return self.width * self.height - self.bits.bit_count()
 
     def asList(self, key=True):
+        bits = self.bits
+        if not key:
+            bits ^= (1 << (self.width * self.height)) - 1
         list = []
-        for x in range(self.width):
-            for y in range(self.height):
-                if self[x][y] == key:
-                    list.append((x, y))
+        while bits:
+            lowest = bits & -bits
+            list.append(divmod(lowest.bit_length() - 1, self.height))
+            bits ^= lowest
         return list
 
     def packBits(self):
@@ -262,7 +317,7 @@ class Grid:
         return tuple(bits)
 
     def _cellIndexToPosition(self, index):
-        x = index / self.height
+        x = index // self.height
         y = index % self.height
         return x, y
 
@@ -293,6 +348,46 @@ class Grid:
         return bools
 
 
+class GridColumn:
+    """
+    A view of one column of a Grid, so that grid[x][y] reads and writes the
+    grid's bits.
+    """
+
+    def __init__(self, grid, x):
+        self.grid = grid
+        self.offset = x * grid.height
+        self.height = grid.height
+
+    def __getitem__(self, y):
+        if y < 0:
+            y += self.height
+        if not 0 <= y < self.height:
+            raise IndexError('Grid index out of range')
+        return (self.grid.bits >> (self.offset + y)) & 1 == 1
+
+    def __setitem__(self, y, value):
+        if y < 0:
+            y += self.height
+        if not 0 <= y < self.height:
+            raise IndexError('Grid index out of range')
+        grid = self.grid
+        if grid._frozen:
+            raise Exception('Cannot change a frozen grid')
+        if value:
+            grid.bits |= 1 << (self.offset + y)
+        else:
+            grid.bits &= ~(1 << (self.offset + y))
+        grid._hash = None
+
+    def __len__(self):
+        return self.height
+
+    def __iter__(self):
+        for y in range(self.height):
+            yield self[y]
+
+
 def reconstituteGrid(bitRep):
     if type(bitRep) is not type((1, 2)):
         return bitRep
@@ -358,6 +453,11 @@ class Actions:
         if (abs(x - x_int) + abs(y - y_int) > Actions.TOLERANCE):
             return [config.getDirection()]
 
+        if walls.legalActions is not None:
+            legal = walls.legalActions.get((x_int, y_int))
+            if legal is not None:
+                return list(legal)
+
         for dir, vec in Actions._directionsAsList:
             dx, dy = vec
             next_y = y_int + dy
@@ -372,6 +472,10 @@ class Actions:
     def getLegalNeighbors(position, walls):
         x, y = position
         x_int, y_int = int(x + 0.5), int(y + 0.5)
+        if walls.legalNeighbors is not None:
+            neighbors = walls.legalNeighbors.get((x_int, y_int))
+            if neighbors is not None:
+                return list(neighbors)
         neighbors = []
         for dir, vec in Actions._directionsAsList:
             dx, dy = vec
@@ -393,20 +497,64 @@ class Actions:
     getSuccessor = staticmethod(getSuccessor)
 
 
+# Random 64-bit keys for the features of a game state, created on first use
+_zobristRandom = random.Random(188)
+_zobristKeys = {}
+
+
+def zobristKey(feature):
+    """
+    Returns the random 64-bit Zobrist key of a hashable state feature such as
+    ('food', x, y).  A state's key is the xor of the keys of its features, so
+    it can be updated in O(1) when a single feature changes.
+    """
+    key = _zobristKeys.get(feature)
+    if key is None:
+        key = _zobristKeys[feature] = _zobristRandom.getrandbits(64)
+    return key
+
+
+def agentZobristKey(index, agentState):
+    configuration = agentState.configuration
+    return zobristKey(('agent', index, configuration.pos, configuration.direction,
+                       agentState.scaredTimer))
+
+
 class GameStateData:
+    __slots__ = ('food', 'capsules', 'agentStates', 'layout', '_eaten', 'score',
+                 'scoreChange', '_agentKeys', '_hashKey', '_numFood', '_numCapsules',
+                 '_inPlace', '_changeLog', '_readOnly', '_foodEaten', '_foodAdded',
+                 '_capsuleEaten', '_agentMoved', '_lose', '_win')
 
     def __init__(self, prevState=None):
         """
         Generates a new data packet by copying information from its predecessor.
         """
         if prevState != None:
-            self.food = prevState.food.shallowCopy()
+            if prevState._inPlace:
+                # The predecessor edits its food grid in place (see GameState.apply)
+                self.food = prevState.food.copy()
+            else:
+                self.food = prevState.food.shallowCopy()
             self.capsules = prevState.capsules[:]
             self.agentStates = self.copyAgentStates(prevState.agentStates)
             self.layout = prevState.layout
             self._eaten = prevState._eaten
             self.score = prevState.score
+            self._agentKeys = prevState._agentKeys[:]
+            self._hashKey = prevState._hashKey
+            self._numFood = prevState._numFood
+            self._numCapsules = prevState._numCapsules
+
+        self._inPlace = False
+        self._changeLog = ()  # becomes a list on the first GameState.apply
+        self._readOnly = False  # set by Game.runFast on the states agents see
+        self.resetChanges()
 
+    def resetChanges(self):
+        """
+        Clears the record of what the last move changed.
+        """
         self._foodEaten = None
         self._foodAdded = None
         self._capsuleEaten = None
@@ -415,10 +563,36 @@ class GameStateData:
         self._win = False
         self.scoreChange = 0
 
+    def saveChanges(self):
+        """
+        Returns everything a move can change, for restoreChanges.  The food
+        grid is not saved; at most the cell in _foodEaten changes.
+        """
+        agents = [(s.configuration, s.scaredTimer) for s in self.agentStates]
+        return (agents, self.capsules[:], self._eaten[:], self.score, self.scoreChange,
+                self._foodEaten, self._foodAdded, self._capsuleEaten, self._agentMoved,
+                self._lose, self._win, self._agentKeys[:], self._hashKey,
+                self._numFood, self._numCapsules)
+
+    def restoreChanges(self, saved):
+        """
+        Reverts the move made after saveChanges returned saved.
+        """
+        if self._foodEaten != None:
+            x, y = self._foodEaten
+            self.food[x][y] = True
+        agents, self.capsules, self._eaten, self.score, self.scoreChange, \
+            self._foodEaten, self._foodAdded, self._capsuleEaten, self._agentMoved, \
+            self._lose, self._win, self._agentKeys, self._hashKey, \
+            self._numFood, self._numCapsules = saved
+        for agentState, (configuration, scaredTimer) in zip(self.agentStates, agents):
+            agentState.configuration = configuration
+            agentState.scaredTimer = scaredTimer
+
     def deepCopy(self):
         state = GameStateData(self)
         state.food = self.food.deepCopy()
-        state.layout = self.layout.deepCopy()
+        state.layout = self.layout  # Layouts are immutable and shared
         state._agentMoved = self._agentMoved
         state._foodEaten = self._foodEaten
         state._foodAdded = self._foodAdded
@@ -431,6 +605,40 @@ class GameStateData:
             copiedStates.append(agentState.copy())
         return copiedStates
 
+    def key(self):
+        """
+        Returns a 64-bit Zobrist key of the agents, food, capsules and score.
+        Equal states have equal keys.
+        """
+        return self._hashKey ^ zobristKey(('score', self.score))
+
+    def updateAgentKeys(self):
+        """
+        Folds changed agent configurations and scared timers into the key.
+        Food and capsules update the key as they are eaten.
+        """
+        agentKeys = self._agentKeys
+        for index, agentState in enumerate(self.agentStates):
+            agentKey = agentZobristKey(index, agentState)
+            if agentKey != agentKeys[index]:
+                self._hashKey ^= agentKeys[index] ^ agentKey
+                agentKeys[index] = agentKey
+
+    def computeKey(self):
+        """
+        Computes the Zobrist key from scratch.
+        """
+        self._agentKeys = [agentZobristKey(index, agentState)
+                           for index, agentState in enumerate(self.agentStates)]
+        key = 0
+        for agentKey in self._agentKeys:
+            key ^= agentKey
+        for x, y in self.food.asList():
+            key ^= zobristKey(('food', x, y))
+        for capsule in self.capsules:
+            key ^= zobristKey(('capsule', capsule))
+        self._hashKey = key
+
     def __eq__(self, other):
         """
         Allows two states to be compared.
@@ -438,6 +646,8 @@ class GameStateData:
         if other == None:
             return False
         # TODO Check for type of other
+        if self._hashKey != other._hashKey:
+            return False
         if not self.agentStates == other.agentStates:
             return False
         if not self.food == other.food:
@@ -452,13 +662,7 @@ class GameStateData:
         """
         Allows states to be keys of dictionaries.
         """
-        for i, state in enumerate(self.agentStates):
-            try:
-                int(hash(state))
-            except TypeError as e:
-                print(e)
-                # hash(state)
-        return int((hash(tuple(self.agentStates)) + 13*hash(self.food) + 113 * hash(tuple(self.capsules)) + 7 * hash(self.score)) % 1048575)
+        return self.key()
 
     def __str__(self):
         width, height = self.layout.width, self.layout.height
@@ -520,7 +724,10 @@ class GameStateData:
         """
         self.food = layout.food.copy()
         #self.capsules = []
-        self.capsules = layout.capsules[:]
+        self.capsules = list(layout.capsules)
+        # Remaining food and capsules, kept up to date by PacmanRules.consume
+        self._numFood = layout.totalFood
+        self._numCapsules = len(self.capsules)
         self.layout = layout
         self.score = 0
         self.scoreChange = 0
@@ -534,8 +741,9 @@ class GameStateData:
                 else:
                     numGhosts += 1
             self.agentStates.append(AgentState(
-                Configuration(pos, Directions.STOP), isPacman))
+                Configuration.intern(pos, Directions.STOP), isPacman))
         self._eaten = [False for a in self.agentStates]
+        self.computeKey()
 
 
 try:
@@ -550,7 +758,9 @@ class Game:
     The Game manages the control flow, soliciting actions from agents.
     """
 
-    def __init__(self, agents, display, rules, startingIndex=0, muteAgents=False, catchExceptions=False):
+    def __init__(self, agents, display, rules, startingIndex=0, muteAgents=False, catchExceptions=False, fastSimulation=False):
+        if fastSimulation and catchExceptions:
+            raise ValueError('fastSimulation runs trusted agents; it cannot catch their exceptions')
         self.agentCrashed = False
         self.agents = agents
         self.display = display
@@ -559,6 +769,7 @@ class Game:
         self.gameOver = False
         self.muteAgents = muteAgents
         self.catchExceptions = catchExceptions
+        self.fastSimulation = fastSimulation
         self.moveHistory = []
         self.totalAgentTimes = [0 for agent in agents]
         self.totalAgentTimeWarnings = [0 for agent in agents]
@@ -605,6 +816,9 @@ class Game:
         """
         Main control loop for game play.
         """
+        if self.fastSimulation:
+            self.runFast()
+            return
         self.display.initialize(self.state.data)
         self.numMoves = 0
 
@@ -624,12 +838,10 @@ class Game:
                 self.mute(i)
                 if self.catchExceptions:
                     try:
-                        timed_func = TimeoutFunction(
-                            agent.registerInitialState, int(self.rules.getMaxStartupTime(i)))
                         try:
-                            start_time = time.time()
-                            timed_func(self.state.deepCopy())
-                            time_taken = time.time() - start_time
+                            _, time_taken = timedCall(
+                                agent.registerInitialState,
+                                self.rules.getMaxStartupTime(i), self.state.deepCopy())
                             self.totalAgentTimes[i] += time_taken
                         except TimeoutFunctionException:
                             print("Agent %d ran out of time on startup!" %
@@ -660,14 +872,14 @@ class Game:
                 self.mute(agentIndex)
                 if self.catchExceptions:
                     try:
-                        timed_func = TimeoutFunction(agent.observationFunction, int(
-                            self.rules.getMoveTimeout(agentIndex)))
+                        start_time = time.perf_counter()
                         try:
-                            start_time = time.time()
-                            observation = timed_func(self.state.deepCopy())
+                            observation, _ = timedCall(
+                                agent.observationFunction,
+                                self.rules.getMoveTimeout(agentIndex), self.state.deepCopy())
                         except TimeoutFunctionException:
                             skip_action = True
-                        move_time += time.time() - start_time
+                        move_time += time.perf_counter() - start_time
                         self.unmute()
                     except Exception as data:
                         self._agentCrash(agentIndex, quiet=False)
@@ -685,13 +897,12 @@ class Game:
             self.mute(agentIndex)
             if self.catchExceptions:
                 try:
-                    timed_func = TimeoutFunction(agent.getAction, int(
-                        self.rules.getMoveTimeout(agentIndex)) - int(move_time))
                     try:
-                        start_time = time.time()
                         if skip_action:
                             raise TimeoutFunctionException()
-                        action = timed_func(observation)
+                        action, time_taken = timedCall(
+                            agent.getAction,
+                            self.rules.getMoveTimeout(agentIndex) - move_time, observation)
                     except TimeoutFunctionException:
                         print("Agent %d timed out on a single move!" %
                               agentIndex, file=sys.stderr)
@@ -700,7 +911,7 @@ class Game:
                         self.unmute()
                         return
 
-                    move_time += time.time() - start_time
+                    move_time += time_taken
 
                     if move_time > self.rules.getMoveWarningTime(agentIndex):
                         self.totalAgentTimeWarnings[agentIndex] += 1
@@ -776,3 +987,74 @@ class Game:
                     self.unmute()
                     return
         self.display.finish()
+
+    def runFast(self):
+        """
+        Control loop of fastSimulation mode, for trusted agents in headless
+        batch runs.  Agents are handed the current state itself instead of a
+        deep copy, made read-only: its food grid is frozen and apply() refuses
+        it (generateSuccessor still works, and successors are writable).
+        Agent hooks are looked up once, there are no timeouts, and a null
+        display is never called.
+        """
+        display = self.display
+        if getattr(display, 'checkNullDisplay', lambda: False)():
+            display = None
+        if display is not None:
+            display.initialize(self.state.data)
+        self.numMoves = 0
+
+        agents = self.agents
+        for i, agent in enumerate(agents):
+            if not agent:
+                self.mute(i)
+                # this is a null agent, meaning it failed to load
+                # the other team wins
+                print("Agent %d failed to load" % i, file=sys.stderr)
+                self.unmute()
+                self._agentCrash(i, quiet=True)
+                return
+        self.state.data.food.freeze()
+        self.state.data._readOnly = True
+        for i, agent in enumerate(agents):
+            registerInitialState = getattr(agent, 'registerInitialState', None)
+            if registerInitialState is not None:
+                self.mute(i)
+                registerInitialState(self.state)
+                self.unmute()
+
+        observers = [getattr(agent, 'observationFunction', None) for agent in agents]
+        actors = [agent.getAction for agent in agents]
+        muteAgents = self.muteAgents
+        agentIndex = self.startingIndex
+        numAgents = len(agents)
+
+        while not self.gameOver:
+            if muteAgents:
+                self.mute(agentIndex)
+            observe = observers[agentIndex]
+            observation = self.state if observe is None else observe(self.state)
+            action = actors[agentIndex](observation)
+            if muteAgents:
+                self.unmute()
+
+            self.moveHistory.append((agentIndex, action))
+            self.state = self.state.generateSuccessor(agentIndex, action)
+            if display is not None:
+                display.update(self.state.data)
+
+            self.rules.process(self.state, self)
+            self.state.data.food.freeze()
+            self.state.data._readOnly = True
+            if agentIndex == numAgents + 1:
+                self.numMoves += 1
+            agentIndex = (agentIndex + 1) % numAgents
+
+        for agentIndex, agent in enumerate(agents):
+            final = getattr(agent, 'final', None)
+            if final is not None:
+                self.mute(agentIndex)
+                final(self.state)
+                self.unmute()
+        if display is not None:
+            display.finish()
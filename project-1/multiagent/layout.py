@@ -13,17 +13,34 @@
 
 
 from util import manhattanDistance
-from game import Grid
+from game import Grid, Actions, Configuration, Directions
 import os
 import random
+import hashlib
+from array import array
+from collections import deque
 from functools import reduce
 
 VISIBILITY_MATRIX_CACHE = {}
 
+# Layouts loaded by getLayout, keyed by their text, so each is built once
+LAYOUT_CACHE = {}
+
+# All-pairs maze distance tables, keyed by a hash of the layout text.  Tables
+# are also saved under MAZE_DISTANCE_CACHE_DIR so later runs can load them.
+MAZE_DISTANCE_CACHE = {}
+MAZE_DISTANCE_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'distanceCache')
+UNREACHABLE = 0xFFFF
+
 
 class Layout:
     """
     A Layout manages the static information about the game board.
+
+    Layouts are immutable once built: the walls and food grids are frozen and
+    capsules and agentPositions are tuples, so every game state shares its
+    layout instead of copying it.  Legal moves are precomputed per cell.
     """
 
     def __init__(self, layoutText):
@@ -36,9 +53,23 @@ class Layout:
         self.numGhosts = 0
         self.processLayoutText(layoutText)
         self.layoutText = layoutText
-        self.totalFood = len(self.food.asList())
+        self.totalFood = self.food.count()
+        self.capsules = tuple(self.capsules)
+        self.agentPositions = tuple(self.agentPositions)
+        self.initializeMoveTables()
+        self.walls.freeze()
+        self.food.freeze()
+        self.mazeCells = None
+        self.mazeDistances = None
         # self.initializeVisibilityMatrix()
 
+    def __getstate__(self):
+        # Distance tables are large; unpickled layouts reload them from the cache
+        state = self.__dict__.copy()
+        state['mazeCells'] = None
+        state['mazeDistances'] = None
+        return state
+
     def getNumGhosts(self):
         return self.numGhosts
 
@@ -66,6 +97,120 @@ class Layout:
             self.visibility = VISIBILITY_MATRIX_CACHE[reduce(
                 str.__add__, self.layoutText)]
 
+    def initializeMoveTables(self):
+        """
+        Records, for every open cell, the legal directions and neighbor cells
+        on the walls grid (used by Actions.getPossibleActions and
+        Actions.getLegalNeighbors) and the legal ghost actions for each
+        direction of travel, so legal move generation is a dict lookup.
+        """
+        walls = self.walls
+        legalActions = {}
+        legalNeighbors = {}
+        self.ghostActions = {}
+        for cell in walls.asList(False):
+            possible = Actions.getPossibleActions(
+                Configuration(cell, Directions.STOP), walls)
+            legalActions[cell] = tuple(possible)
+            legalNeighbors[cell] = tuple(Actions.getLegalNeighbors(cell, walls))
+            # Ghosts cannot stop, nor turn around unless at a dead end
+            moves = [action for action in possible if action != Directions.STOP]
+            for direction in Actions._directions:
+                reverse = Actions.reverseDirection(direction)
+                legal = list(moves)
+                if reverse in legal and len(legal) > 1:
+                    legal.remove(reverse)
+                self.ghostActions[cell + (direction,)] = tuple(legal)
+        walls.legalActions = legalActions
+        walls.legalNeighbors = legalNeighbors
+
+    def getGhostActions(self, configuration):
+        """
+        Returns the legal actions of a ghost in the given configuration, or
+        None if it is between grid points or off the open cells.
+        """
+        x, y = configuration.pos
+        x_int, y_int = int(x + 0.5), int(y + 0.5)
+        if abs(x - x_int) + abs(y - y_int) > Actions.TOLERANCE:
+            return None
+        legal = self.ghostActions.get((x_int, y_int, configuration.direction))
+        if legal is None:
+            return None
+        return list(legal)
+
+    def mazeDistance(self, pos1, pos2):
+        """
+        Returns the length of the shortest path between two positions that
+        avoids walls, or infinity if there is none.  Positions are rounded to
+        the nearest grid point.  The first call builds (or loads) a table of
+        the distances between all pairs of open cells; later calls are a
+        single array lookup.
+        """
+        if self.mazeDistances is None:
+            self.initializeMazeDistances()
+        cells = self.mazeCells
+        x1, y1 = pos1
+        x2, y2 = pos2
+        i = cells[(int(x1 + 0.5), int(y1 + 0.5))]
+        j = cells[(int(x2 + 0.5), int(y2 + 0.5))]
+        distance = self.mazeDistances[i * len(cells) + j]
+        if distance == UNREACHABLE:
+            return float('inf')
+        return distance
+
+    def initializeMazeDistances(self):
+        """
+        Builds the all-pairs maze distance table with one breadth first search
+        per open cell, or loads it from memory or the on-disk cache.
+        """
+        openCells = self.walls.asList(False)
+        self.mazeCells = dict((cell, i) for i, cell in enumerate(openCells))
+        textHash = hashlib.sha1('\n'.join(self.layoutText).encode()).hexdigest()
+        if textHash in MAZE_DISTANCE_CACHE:
+            self.mazeDistances = MAZE_DISTANCE_CACHE[textHash]
+            return
+
+        numCells = len(openCells)
+        path = os.path.join(MAZE_DISTANCE_CACHE_DIR, textHash + '.dist')
+        distances = array('H')
+        try:
+            with open(path, 'rb') as f:
+                distances.fromfile(f, numCells * numCells)
+        except (OSError, EOFError):
+            distances = self._computeMazeDistances(openCells)
+            try:
+                os.makedirs(MAZE_DISTANCE_CACHE_DIR, exist_ok=True)
+                tmpPath = '%s.%d.tmp' % (path, os.getpid())
+                with open(tmpPath, 'wb') as f:
+                    distances.tofile(f)
+                os.replace(tmpPath, path)
+            except OSError:
+                pass  # The cache is only an optimization
+        MAZE_DISTANCE_CACHE[textHash] = distances
+        self.mazeDistances = distances
+
+    def _computeMazeDistances(self, openCells):
+        cells = self.mazeCells
+        numCells = len(openCells)
+        neighbors = []
+        for x, y in openCells:
+            adjacent = [(x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)]
+            neighbors.append([cells[pos] for pos in adjacent if pos in cells])
+
+        distances = array('H', [UNREACHABLE]) * (numCells * numCells)
+        for source in range(numCells):
+            row = source * numCells
+            distances[row + source] = 0
+            frontier = deque([source])
+            while frontier:
+                cell = frontier.popleft()
+                nextDistance = distances[row + cell] + 1
+                for neighbor in neighbors[cell]:
+                    if distances[row + neighbor] == UNREACHABLE:
+                        distances[row + neighbor] = nextDistance
+                        frontier.append(neighbor)
+        return distances
+
     def isWall(self, pos):
         x, col = pos
         return self.walls[x][col]
@@ -97,7 +242,8 @@ class Layout:
         return "\n".join(self.layoutText)
 
     def deepCopy(self):
-        return Layout(self.layoutText[:])
+        # Layouts are immutable, so they can be shared rather than copied
+        return self
 
     def processLayoutText(self, layoutText):
         """
@@ -159,6 +305,17 @@ def tryToLoad(fullname):
         return None
     f = open(fullname)
     try:
-        return Layout([line.strip() for line in f])
+        return internLayout([line.strip() for line in f])
     finally:
         f.close()
+
+
+def internLayout(layoutText):
+    """
+    Returns the shared Layout for layoutText, building it on first use.
+    """
+    key = tuple(layoutText)
+    layout = LAYOUT_CACHE.get(key)
+    if layout is None:
+        layout = LAYOUT_CACHE[key] = Layout(list(layoutText))
+    return layout
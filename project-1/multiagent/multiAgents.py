@@ -14,10 +14,13 @@
 
 from util import manhattanDistance
 from game import Directions
-import random, util
+import random, util, time
 
 from game import Agent
 from pacman import GameState
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 
 class ReflexAgent(Agent):
     """
@@ -87,6 +90,235 @@ def scoreEvaluationFunction(currentGameState: GameState):
     """
     return currentGameState.getScore()
 
+class TranspositionTable:
+    """
+    A bounded cache of search values shared by the adversarial agents.
+
+    Entries are keyed on (state key, agentIndex, remaining depth) and hold a
+    value together with a flag telling whether that value is exact or only a
+    lower/upper bound (alpha-beta cutoffs produce bounds).  Once the table
+    holds maxSize entries the least recently used one is evicted.
+    """
+    EXACT = 0
+    LOWER = 1
+    UPPER = 2
+    # Statistics that root search workers report back (see searchCounters)
+    COUNTERS = ('hits', 'misses')
+
+    def __init__(self, maxSize=100000):
+        self.maxSize = maxSize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key):
+        """
+        Returns the (value, flag) pair stored for key, or None.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def store(self, key, value, flag=EXACT):
+        self.entries[key] = (value, flag)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+class MoveOrdering:
+    """
+    Orders moves for alpha-beta search so that cutoffs happen early.
+
+    At each node the best move found the last time that position was searched
+    is tried first (this replays the principal variation of the previous
+    iteration or turn), then the killer moves that caused cutoffs at the same
+    ply, then the remaining moves by their history score.  History scores
+    persist across the turns of one game.
+
+    The ordering also counts visited nodes and cutoffs.  For each cutoff the
+    nodes saved are estimated as the number of pruned sibling moves times the
+    average subtree size of the siblings that were searched.
+    """
+    NUM_KILLERS = 2
+    # Statistics that root search workers report back (see searchCounters)
+    COUNTERS = ('nodes', 'cutoffs', 'prunedMoves', 'savedNodes')
+
+    def __init__(self, maxSize=100000):
+        self.maxSize = maxSize
+        self.bestMoves = {}
+        self.history = util.Counter()
+        self.killers = {}
+        self.nodes = 0
+        self.cutoffs = 0
+        self.prunedMoves = 0
+        self.savedNodes = 0
+        self.searches = 0
+        self.branchingFactorTotal = 0.0
+
+    def newGame(self):
+        self.bestMoves = {}
+        self.history = util.Counter()
+        self.killers = {}
+
+    def newSearch(self):
+        self.killers = {}
+
+    def order(self, state, agentIndex, ply, key, actions):
+        """
+        Returns actions sorted best-first.
+        """
+        bestMove = self.bestMoves.get(key)
+        killers = self.killers.get(ply, ())
+        position = moveOrigin(state, agentIndex)
+
+        def rank(action):
+            if action == bestMove:
+                return (0, 0)
+            if action in killers:
+                return (1, 0)
+            return (2, -self.history[(agentIndex, position, action)])
+        return sorted(actions, key=rank)
+
+    def storeBest(self, key, action):
+        if len(self.bestMoves) >= self.maxSize:
+            self.bestMoves = {}
+        self.bestMoves[key] = action
+
+    def recordCutoff(self, state, agentIndex, ply, action, remainingDepth, prunedMoves, averageSubtree):
+        self.cutoffs += 1
+        self.prunedMoves += prunedMoves
+        self.savedNodes += prunedMoves * averageSubtree
+        killers = self.killers.setdefault(ply, [])
+        if action not in killers:
+            killers.insert(0, action)
+            del killers[self.NUM_KILLERS:]
+        position = moveOrigin(state, agentIndex)
+        self.history[(agentIndex, position, action)] += remainingDepth * remainingDepth
+
+    def recordSearch(self, nodes, plies):
+        self.searches += 1
+        self.branchingFactorTotal += nodes ** (1.0 / max(plies, 1))
+
+    def effectiveBranchingFactor(self):
+        """
+        Returns the mean over searches of nodes ** (1 / plies searched).
+        """
+        if self.searches == 0:
+            return 0.0
+        return self.branchingFactorTotal / self.searches
+
+def moveOrigin(state, agentIndex):
+    """
+    Returns the position an agent moves from, used to key history scores.
+    """
+    if agentIndex == 0:
+        return state.getPacmanPosition()
+    return state.getGhostPosition(agentIndex)
+
+class SearchTimeout(Exception):
+    """Raised inside a search once its wall-clock deadline has passed."""
+    pass
+
+# Set in each root search worker process by initSearchWorker
+_workerAgent = None
+_workerRootBound = None
+
+def initSearchWorker(agent, rootBound):
+    global _workerAgent, _workerRootBound
+    _workerAgent = agent
+    _workerRootBound = rootBound
+
+def searchRootAction(gameState, action, maxDepth, deadline):
+    """
+    Searches the subtree below one root action in a worker process and
+    returns (value, cutoff, counters), or (None, None, counters) if the
+    deadline passed.  counters holds what the search added to the worker
+    agent's statistics and history scores, for addSearchCounters.  The
+    shared root bound is raised to the value found so that sibling searches
+    can prune against it.
+    """
+    agent = _workerAgent
+    before = searchCounters(agent)
+    ordering = getattr(agent, 'moveOrdering', None)
+    history = ordering.history.copy() if ordering is not None else None
+    bound = _workerRootBound.get_obj()
+    try:
+        rootValues, cutoff = agent.search(gameState, maxDepth, [action], deadline, bound)[1:]
+        value = rootValues[action]
+    except SearchTimeout:
+        value = cutoff = None
+    else:
+        with _workerRootBound.get_lock():
+            if value > bound.value:
+                bound.value = value
+
+    counters = dict((name, count - before[name])
+                    for name, count in searchCounters(agent).items())
+    if history is not None:
+        counters[('moveOrdering', 'history')] = dict(
+            (move, score - history[move]) for move, score in ordering.history.items()
+            if score != history[move])
+    return value, cutoff, counters
+
+def searchCounters(agent):
+    """
+    Returns {(component, counter): value} for the COUNTERS of the agent's
+    transposition table and move ordering, whichever it uses.
+    """
+    counters = {}
+    for name in ('transpositionTable', 'moveOrdering'):
+        component = getattr(agent, name, None)
+        if component is not None:
+            for counter in component.COUNTERS:
+                counters[(name, counter)] = getattr(component, counter)
+    return counters
+
+def addSearchCounters(agent, counters):
+    """
+    Adds the counters returned by searchRootAction to the agent's own, so
+    that statistics and history scores account for the workers' searches.
+    """
+    for (name, counter), count in counters.items():
+        component = getattr(agent, name)
+        if counter == 'history':
+            for move, score in count.items():
+                component.history[move] += score
+        else:
+            setattr(component, counter, getattr(component, counter) + count)
+
+def stateKey(state):
+    """
+    Returns a hashable key identifying state in a TranspositionTable: the
+    incremental Zobrist key of a GameState, or the state itself for states
+    that don't provide one.
+    """
+    key = getattr(state, 'key', None)
+    return key() if key is not None else state
+
+def bestRootAction(actions, rootValues):
+    """
+    Returns the first of actions with the highest value in rootValues, or
+    STOP if none has one.  Searches pass their root actions as they were
+    before move ordering, so ordering and parallel search change how fast an
+    action is chosen but not which.  Root values at or above the best are
+    exact under alpha-beta, so ties are found whatever the search order.
+    """
+    bestValue = -float("inf")
+    bestAction = Directions.STOP
+    for action in actions:
+        value = rootValues.get(action, -float("inf"))
+        if value > bestValue:
+            bestValue = value
+            bestAction = action
+    return bestAction
+
 class MultiAgentSearchAgent(Agent):
     """
     This class provides some common elements to all of your
@@ -102,10 +334,152 @@ class MultiAgentSearchAgent(Agent):
     is another abstract class.
     """
 
-    def __init__(self, evalFn = 'scoreEvaluationFunction', depth = '2'):
+    def __init__(self, evalFn = 'scoreEvaluationFunction', depth = '2', tt = '0', ttSize = '100000',
+                 timeBudget = '0', workers = '1'):
         self.index = 0 # Pacman is always agent index 0
         self.evaluationFunction = util.lookup(evalFn, globals())
         self.depth = int(depth)
+        # Optional transposition table, enabled with -a tt=1,ttSize=N
+        self.transpositionTable = TranspositionTable(int(ttSize)) if int(tt) else None
+        # Seconds per move for iterative deepening; 0 searches to self.depth
+        self.timeBudget = float(timeBudget)
+        # Depth of the last iteration iterativeDeepening finished (0 before any)
+        self.lastCompletedDepth = 0
+        # Processes that search root actions in parallel, enabled with -a workers=N
+        self.workers = int(workers)
+        self.searchPool = None
+        self.rootBound = None
+
+    def __getstate__(self):
+        # The worker pool cannot be pickled; workers get agents without one
+        state = self.__dict__.copy()
+        state['searchPool'] = None
+        return state
+
+    def registerInitialState(self, gameState: GameState):
+        """
+        Starts the root search worker pool, once per game.
+        """
+        self.shutdownPool()
+        if self.workers > 1:
+            self.rootBound = multiprocessing.Value('d', -float("inf"))
+            self.searchPool = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=initSearchWorker,
+                initargs=(self, self.rootBound))
+
+    def shutdownPool(self):
+        if self.searchPool is not None:
+            self.searchPool.shutdown(cancel_futures=True)
+            self.searchPool = None
+            self.rootBound = None
+
+    def search(self, gameState, maxDepth, rootActions=None, deadline=None, rootBound=None):
+        """
+        Searches maxDepth plies from gameState, trying Pacman's rootActions in
+        the given order, and returns (bestAction, rootValues, cutoff) where
+        rootValues maps each root action to its backed-up value and cutoff
+        tells whether any node was evaluated because of the depth limit.
+        Raises SearchTimeout once time.perf_counter() passes deadline.
+
+        rootBound, if given, is a shared multiprocessing.Value holding the
+        best root value found so far by other processes.
+        """
+        util.raiseNotDefined()
+
+    def runSearch(self, gameState, maxDepth, rootActions=None, deadline=None):
+        """
+        Runs self.search, sending each root action to the worker pool when
+        one is running.  Ties are broken as in a serial search (see
+        bestRootAction), so the chosen action is the same.  The statistics
+        the workers gather are added to this agent's, even if the search
+        times out.
+        """
+        if self.searchPool is None:
+            return self.search(gameState, maxDepth, rootActions, deadline)
+
+        tieOrder = rootActions
+        if rootActions is None:
+            tieOrder = gameState.getLegalActions(0)
+            rootActions = self.orderRootActions(gameState, tieOrder)
+        with self.rootBound.get_lock():
+            self.rootBound.value = -float("inf")
+        futures = [self.searchPool.submit(searchRootAction, gameState, action, maxDepth, deadline)
+                   for action in rootActions]
+
+        rootValues = {}
+        cutoff = False
+        timedOut = False
+        ordering = getattr(self, 'moveOrdering', None)
+        nodesBefore = ordering.nodes if ordering is not None else 0
+        try:
+            for action, future in zip(rootActions, futures):
+                if future.cancelled():
+                    continue
+                value, actionCutoff, counters = future.result()
+                addSearchCounters(self, counters)
+                if value is None:
+                    # Out of time: collect what the running searches did
+                    timedOut = True
+                    for other in futures:
+                        other.cancel()
+                    continue
+                rootValues[action] = value
+                cutoff = cutoff or actionCutoff
+        finally:
+            for future in futures:
+                future.cancel()
+        if timedOut:
+            raise SearchTimeout()
+        bestAction = bestRootAction(tieOrder, rootValues)
+        if ordering is not None:
+            ordering.storeBest((stateKey(gameState), 0), bestAction)
+            ordering.recordSearch(ordering.nodes - nodesBefore, maxDepth * gameState.getNumAgents())
+        return bestAction, rootValues, cutoff
+
+    def orderRootActions(self, gameState, actions):
+        """
+        Returns Pacman's legal actions in the order a search tries them when
+        no rootActions are given.  Serial and parallel searches both use it.
+        """
+        return actions
+
+    def iterativeDeepening(self, gameState):
+        """
+        Searches 1, 2, 3... plies deep until self.timeBudget seconds have
+        passed and returns the best action of the last finished iteration.
+        Root actions are tried in the order of the previous iteration's
+        values, so the most promising move is searched first.
+        """
+        deadline = time.perf_counter() + self.timeBudget
+        rootActions = gameState.getLegalActions(0)
+        bestAction = rootActions[0] if rootActions else Directions.STOP
+        depth = 1
+        while True:
+            try:
+                action, rootValues, cutoff = self.runSearch(gameState, depth, rootActions, deadline)
+            except SearchTimeout:
+                break
+            bestAction = action
+            self.lastCompletedDepth = depth
+            rootActions = sorted(rootActions, key=lambda a: -rootValues[a])
+            if not cutoff:
+                break # the whole game tree fits within this depth
+            depth += 1
+        return bestAction
+
+    def final(self, state):
+        """
+        Stops the worker pool and reports transposition table usage at the
+        end of a game.
+        """
+        self.shutdownPool()
+        table = self.transpositionTable
+        if table is not None and self.workers > 1:
+            print('Transposition table: %d hits, %d misses, entries kept in %d workers' %
+                  (table.hits, table.misses, self.workers))
+        elif table is not None:
+            print('Transposition table: %d hits, %d misses, %d entries' %
+                  (table.hits, table.misses, len(table)))
 
 class MinimaxAgent(MultiAgentSearchAgent):
     """
@@ -136,11 +510,41 @@ class MinimaxAgent(MultiAgentSearchAgent):
         Returns whether or not the game state is a losing state
         """
         "*** YOUR CODE HERE ***"
+        if self.timeBudget > 0:
+            return self.iterativeDeepening(gameState)
+        return self.runSearch(gameState, self.depth)[0]
+
+    def search(self, gameState, maxDepth, rootActions=None, deadline=None, rootBound=None):
+        """
+        Runs a minimax search maxDepth plies deep and returns
+        (bestAction, rootValues, cutoff).  See MultiAgentSearchAgent.search.
+        """
+        table = self.transpositionTable
+        cutoff = False
+
         def minimax(state, agentIndex, depth):
+            nonlocal cutoff
+            if deadline is not None and time.perf_counter() > deadline:
+                raise SearchTimeout()
+
             # Terminal test: reached max depth or game over
-            if depth == self.depth or state.isWin() or state.isLose():
+            if depth == maxDepth or state.isWin() or state.isLose():
+                if depth == maxDepth:
+                    cutoff = True
                 return self.evaluationFunction(state)
 
+            if table is not None:
+                key = (stateKey(state), agentIndex, maxDepth - depth)
+                entry = table.lookup(key)
+                if entry is not None:
+                    cutoff = True
+                    return entry[0]
+                value = minimaxValue(state, agentIndex, depth)
+                table.store(key, value)
+                return value
+            return minimaxValue(state, agentIndex, depth)
+
+        def minimaxValue(state, agentIndex, depth):
             numAgents = state.getNumAgents()
             actions = state.getLegalActions(agentIndex)
 
@@ -170,15 +574,19 @@ class MinimaxAgent(MultiAgentSearchAgent):
         # Root call: choose the best action for Pacman (agent 0)
         bestValue = -float("inf")
         bestAction = Directions.STOP
+        rootValues = {}
 
-        for action in gameState.getLegalActions(0):
+        if rootActions is None:
+            rootActions = gameState.getLegalActions(0)
+        for action in rootActions:
             successor = gameState.generateSuccessor(0, action)
             value = minimax(successor, 1, 0)
+            rootValues[action] = value
             if value > bestValue:
                 bestValue = value
                 bestAction = action
 
-        return bestAction
+        return bestAction, rootValues, cutoff
 
 
 class AlphaBetaAgent(MultiAgentSearchAgent):
@@ -186,16 +594,94 @@ class AlphaBetaAgent(MultiAgentSearchAgent):
     Your minimax agent with alpha-beta pruning (question 3)
     """
 
+    def __init__(self, *args, ordering = '0', **kwargs):
+        MultiAgentSearchAgent.__init__(self, *args, **kwargs)
+        # Optional move ordering, enabled with -a ordering=1
+        self.moveOrdering = MoveOrdering() if int(ordering) else None
+
+    def registerInitialState(self, gameState: GameState):
+        MultiAgentSearchAgent.registerInitialState(self, gameState)
+        if self.moveOrdering is not None:
+            self.moveOrdering.newGame()
+
+    def final(self, state):
+        MultiAgentSearchAgent.final(self, state)
+        ordering = self.moveOrdering
+        if ordering is not None:
+            print('Move ordering: %d nodes, %d cutoffs, %d moves pruned (~%d nodes saved), '
+                  'effective branching factor %.2f' %
+                  (ordering.nodes, ordering.cutoffs, ordering.prunedMoves,
+                   ordering.savedNodes, ordering.effectiveBranchingFactor()))
+
+    def orderRootActions(self, gameState, actions):
+        if self.moveOrdering is None:
+            return actions
+        return self.moveOrdering.order(gameState, 0, 0, (stateKey(gameState), 0), actions)
+
     def getAction(self, gameState: GameState):
         """
         Returns the minimax action using self.depth and self.evaluationFunction
         """
         "*** YOUR CODE HERE ***"
+        if self.moveOrdering is not None:
+            self.moveOrdering.newSearch()
+        if self.timeBudget > 0:
+            return self.iterativeDeepening(gameState)
+        return self.runSearch(gameState, self.depth)[0]
+
+    def search(self, gameState, maxDepth, rootActions=None, deadline=None, rootBound=None):
+        """
+        Runs an alpha-beta search maxDepth plies deep and returns
+        (bestAction, rootValues, cutoff).  See MultiAgentSearchAgent.search.
+        """
+        table = self.transpositionTable
+        ordering = self.moveOrdering
+        cutoff = False
+
         def alphabeta(state, agentIndex, depth, alpha, beta):
+            nonlocal cutoff
+            if deadline is not None and time.perf_counter() > deadline:
+                raise SearchTimeout()
+            if ordering is not None:
+                ordering.nodes += 1
+
             # Terminal test
-            if depth == self.depth or state.isWin() or state.isLose():
+            if depth == maxDepth or state.isWin() or state.isLose():
+                if depth == maxDepth:
+                    cutoff = True
                 return self.evaluationFunction(state)
 
+            # Root siblings searched in other processes may have raised alpha
+            if rootBound is not None and agentIndex != 0:
+                alpha = max(alpha, rootBound.value)
+
+            if table is None:
+                return alphabetaValue(state, agentIndex, depth, alpha, beta)
+
+            # Reuse a stored value if it is exact or its bound already
+            # falls outside the (alpha, beta) window
+            key = (stateKey(state), agentIndex, maxDepth - depth)
+            entry = table.lookup(key)
+            if entry is not None:
+                value, flag = entry
+                cutoff = True
+                if flag == TranspositionTable.EXACT:
+                    return value
+                if flag == TranspositionTable.LOWER and value >= beta:
+                    return value
+                if flag == TranspositionTable.UPPER and value <= alpha:
+                    return value
+
+            value = alphabetaValue(state, agentIndex, depth, alpha, beta)
+            if value <= alpha:
+                table.store(key, value, TranspositionTable.UPPER)
+            elif value >= beta:
+                table.store(key, value, TranspositionTable.LOWER)
+            else:
+                table.store(key, value, TranspositionTable.EXACT)
+            return value
+
+        def alphabetaValue(state, agentIndex, depth, alpha, beta):
             actions = state.getLegalActions(agentIndex)
             if not actions:
                 return self.evaluationFunction(state)
@@ -204,6 +690,10 @@ class AlphaBetaAgent(MultiAgentSearchAgent):
             nextAgent = (agentIndex + 1) % numAgents
             nextDepth = depth + 1 if nextAgent == 0 else depth
 
+            if ordering is not None:
+                return orderedValue(state, agentIndex, depth, alpha, beta, actions,
+                                    numAgents, nextAgent, nextDepth)
+
             # Pacman: max node
             if agentIndex == 0:
                 value = -float("inf")
@@ -225,20 +715,63 @@ class AlphaBetaAgent(MultiAgentSearchAgent):
                 beta = min(beta, value)
             return value
 
+        def orderedValue(state, agentIndex, depth, alpha, beta, actions,
+                         numAgents, nextAgent, nextDepth):
+            # Same as alphabetaValue, but tries the most promising moves first
+            # and feeds cutoffs back into the move ordering
+            ply = depth * numAgents + agentIndex
+            key = (stateKey(state), agentIndex)
+            actions = ordering.order(state, agentIndex, ply, key, actions)
+            maximizing = agentIndex == 0
+            value = -float("inf") if maximizing else float("inf")
+            bestAction = actions[0]
+            nodesBefore = ordering.nodes
+            for index, action in enumerate(actions):
+                successor = state.generateSuccessor(agentIndex, action)
+                childValue = alphabeta(successor, nextAgent, nextDepth, alpha, beta)
+                if maximizing:
+                    if childValue > value:
+                        value, bestAction = childValue, action
+                    pruned = value > beta
+                    alpha = max(alpha, value)
+                else:
+                    if childValue < value:
+                        value, bestAction = childValue, action
+                    pruned = value < alpha
+                    beta = min(beta, value)
+                if pruned:
+                    averageSubtree = (ordering.nodes - nodesBefore) / float(index + 1)
+                    ordering.recordCutoff(state, agentIndex, ply, action, maxDepth - depth,
+                                          len(actions) - index - 1, averageSubtree)
+                    break
+            ordering.storeBest(key, bestAction)
+            return value
+
         # Root: Pacman chooses best action
         bestValue = -float("inf")
         bestAction = Directions.STOP
         alpha, beta = -float("inf"), float("inf")
-
-        for action in gameState.getLegalActions(0):
+        rootValues = {}
+        nodesBefore = ordering.nodes if ordering is not None else 0
+
+        tieOrder = rootActions
+        if rootActions is None:
+            tieOrder = gameState.getLegalActions(0)
+            rootActions = self.orderRootActions(gameState, tieOrder)
+        for action in rootActions:
             successor = gameState.generateSuccessor(0, action)
             value = alphabeta(successor, 1, 0, alpha, beta)
+            rootValues[action] = value
             if value > bestValue:
                 bestValue = value
                 bestAction = action
             alpha = max(alpha, bestValue)
+        bestAction = bestRootAction(tieOrder, rootValues)
 
-        return bestAction
+        if ordering is not None:
+            ordering.storeBest((stateKey(gameState), 0), bestAction)
+            ordering.recordSearch(ordering.nodes - nodesBefore, maxDepth * gameState.getNumAgents())
+        return bestAction, rootValues, cutoff
 
 
 class ExpectimaxAgent(MultiAgentSearchAgent):
@@ -254,11 +787,41 @@ class ExpectimaxAgent(MultiAgentSearchAgent):
         legal moves.
         """
         "*** YOUR CODE HERE ***"
+        if self.timeBudget > 0:
+            return self.iterativeDeepening(gameState)
+        return self.runSearch(gameState, self.depth)[0]
+
+    def search(self, gameState, maxDepth, rootActions=None, deadline=None, rootBound=None):
+        """
+        Runs an expectimax search maxDepth plies deep and returns
+        (bestAction, rootValues, cutoff).  See MultiAgentSearchAgent.search.
+        """
+        table = self.transpositionTable
+        cutoff = False
+
         def expectimax(state, agentIndex, depth):
+            nonlocal cutoff
+            if deadline is not None and time.perf_counter() > deadline:
+                raise SearchTimeout()
+
             # Terminal state or depth limit
-            if depth == self.depth or state.isWin() or state.isLose():
+            if depth == maxDepth or state.isWin() or state.isLose():
+                if depth == maxDepth:
+                    cutoff = True
                 return self.evaluationFunction(state)
 
+            if table is not None:
+                key = (stateKey(state), agentIndex, maxDepth - depth)
+                entry = table.lookup(key)
+                if entry is not None:
+                    cutoff = True
+                    return entry[0]
+                value = expectimaxValue(state, agentIndex, depth)
+                table.store(key, value)
+                return value
+            return expectimaxValue(state, agentIndex, depth)
+
+        def expectimaxValue(state, agentIndex, depth):
             actions = state.getLegalActions(agentIndex)
             if not actions:
                 return self.evaluationFunction(state)
@@ -285,15 +848,19 @@ class ExpectimaxAgent(MultiAgentSearchAgent):
         # Root: choose action for Pacman (agent 0)
         bestValue = -float("inf")
         bestAction = Directions.STOP
+        rootValues = {}
 
-        for action in gameState.getLegalActions(0):
+        if rootActions is None:
+            rootActions = gameState.getLegalActions(0)
+        for action in rootActions:
             successor = gameState.generateSuccessor(0, action)
             value = expectimax(successor, 1, 0)
+            rootValues[action] = value
             if value > bestValue:
                 bestValue = value
                 bestAction = action
 
-        return bestAction
+        return bestAction, rootValues, cutoff
 
 
 def betterEvaluationFunction(currentGameState: GameState):
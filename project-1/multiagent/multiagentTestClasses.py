@@ -28,7 +28,7 @@ from pprint import PrettyPrinter
 pp = PrettyPrinter()
 
 from game import Agent
-from pacman import GameState
+from pacman import GameState, DistinctStateTracker
 from ghostAgents import RandomGhost, DirectionalGhost
 import random
 import math
@@ -185,9 +185,13 @@ class GradingAgent(Agent):
         random.seed(self.seed)
 
     def getAction(self, state):
-        GameState.getAndResetExplored()
-        studentAction = (self.studentAgent.getAction(state),
-                         len(GameState.getAndResetExplored()))
+        # grading compares the number of distinct states the student explored
+        previousTracker = GameState.setExpansionTracker(DistinctStateTracker())
+        try:
+            studentAction = (self.studentAgent.getAction(state),
+                             GameState.getAndResetExpansions())
+        finally:
+            GameState.setExpansionTracker(previousTracker)
         optimalActions = self.optimalActions[self.stepCount]
         altDepthActions = self.altDepthActions[self.stepCount]
         partialPlyBugActions = self.partialPlyBugActions[self.stepCount]
@@ -295,11 +299,14 @@ class PolyAgent(Agent):
 
     def getAction(self, state):
         # survey agents
-        GameState.getAndResetExplored()
+        previousTracker = GameState.setExpansionTracker(DistinctStateTracker())
         optimalActionLists = []
-        for agent in self.solutionAgents:
-            optimalActionLists.append((agent.getBestPacmanActions(
-                state)[0], len(GameState.getAndResetExplored())))
+        try:
+            for agent in self.solutionAgents:
+                optimalActionLists.append((agent.getBestPacmanActions(
+                    state)[0], GameState.getAndResetExpansions()))
+        finally:
+            GameState.setExpansionTracker(previousTracker)
         alternativeDepthLists = [agent.getBestPacmanActions(
             state)[0] for agent in self.alternativeDepthAgents]
         partialPlyBugLists = [agent.getBestPacmanActions(
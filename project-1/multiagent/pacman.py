@@ -43,6 +43,8 @@ from game import GameStateData
 from game import Game
 from game import Directions
 from game import Actions
+from game import Configuration
+from game import zobristKey
 from util import nearestPoint
 from util import manhattanDistance
 import util
@@ -58,6 +60,44 @@ import os
 ###################################################
 
 
+class ExpansionCounter:
+    """
+    Counts generateSuccessor calls. This is the default expansion tracker of
+    GameState: it keeps no states alive and costs one increment per call.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def record(self, parent, child):
+        self.count += 1
+
+    def reset(self):
+        count = self.count
+        self.count = 0
+        return count
+
+
+class DistinctStateTracker:
+    """
+    Records every state passed to or returned by generateSuccessor, as the
+    autograder needs to compare distinct explored states.  It hashes both
+    states and keeps them alive until reset, so only install it for grading.
+    """
+
+    def __init__(self):
+        self.states = set()
+
+    def record(self, parent, child):
+        self.states.add(parent)
+        self.states.add(child)
+
+    def reset(self):
+        count = len(self.states)
+        self.states = set()
+        return count
+
+
 class GameState:
     """
     A GameState specifies the full game state, including the food, capsules,
@@ -72,18 +112,43 @@ class GameState:
 
     Note that in classic Pacman, Pacman is always agent 0.
     """
+    __slots__ = ('data',)
 
     ####################################################
     # Accessor methods: use these to access state data #
     ####################################################
 
-    # static variable keeps track of which states have had getLegalActions called
-    explored = set()
+    # static variable: records every generateSuccessor call (see ExpansionCounter)
+    expansionTracker = ExpansionCounter()
+
+    def setExpansionTracker(tracker):
+        """
+        Installs the tracker notified by generateSuccessor and returns the
+        previous one, so callers can restore it.
+        """
+        previous = GameState.expansionTracker
+        GameState.expansionTracker = tracker
+        return previous
+    setExpansionTracker = staticmethod(setExpansionTracker)
+
+    def getAndResetExpansions():
+        """
+        Returns the expansions recorded since the last reset: the number of
+        generateSuccessor calls by default, or the number of distinct states
+        under a DistinctStateTracker.
+        """
+        return GameState.expansionTracker.reset()
+    getAndResetExpansions = staticmethod(getAndResetExpansions)
 
     def getAndResetExplored():
-        tmp = GameState.explored.copy()
-        GameState.explored = set()
-        return tmp
+        """
+        Returns the set of states explored since the last reset. Only a
+        DistinctStateTracker keeps the states; otherwise the set is empty.
+        """
+        tracker = GameState.expansionTracker
+        states = getattr(tracker, 'states', set())
+        tracker.reset()
+        return states
     getAndResetExplored = staticmethod(getAndResetExplored)
 
     def getLegalActions(self, agentIndex=0):
@@ -109,29 +174,68 @@ class GameState:
 
         # Copy current state
         state = GameState(self)
+        state._resolveMove(agentIndex, action)
+        GameState.expansionTracker.record(self, state)
+        return state
 
+    def apply(self, agentIndex, action):
+        """
+        Applies the action to this state in place, without copying it.
+
+        Every call is recorded in a change log so that undo() can restore the
+        state exactly.  This lets a search walk the game tree on a single
+        mutable state; generateSuccessor remains the safe immutable path.
+        Agent states and the food grid returned by the accessors are changed
+        in place too, so don't hold on to them across apply/undo calls.
+        """
+        if self.isWin() or self.isLose():
+            raise Exception('Can\'t apply an action to a terminal state.')
+
+        data = self.data
+        if data._readOnly:
+            raise Exception('Can\'t apply an action to a read-only state; '
+                            'use generateSuccessor.')
+        if not data._inPlace:
+            # Stop sharing the food grid with the state we were copied from
+            data.food = data.food.copy()
+            data._changeLog = []
+            data._inPlace = True
+        data._changeLog.append(data.saveChanges())
+        data.resetChanges()
+        self._resolveMove(agentIndex, action)
+
+    def undo(self):
+        """
+        Reverts the most recent apply() call.
+        """
+        if not self.data._changeLog:
+            raise Exception('No applied action to undo.')
+        self.data.restoreChanges(self.data._changeLog.pop())
+
+    def _resolveMove(self, agentIndex, action):
+        """
+        Updates this state with the effects of the agent taking the action.
+        """
         # Let agent's logic deal with its action's effects on the board
         if agentIndex == 0:  # Pacman is moving
-            state.data._eaten = [False for i in range(state.getNumAgents())]
-            PacmanRules.applyAction(state, action)
+            self.data._eaten = [False for i in range(self.getNumAgents())]
+            PacmanRules.applyAction(self, action)
         else:                # A ghost is moving
-            GhostRules.applyAction(state, action, agentIndex)
+            GhostRules.applyAction(self, action, agentIndex)
 
         # Time passes
         if agentIndex == 0:
-            state.data.scoreChange += -TIME_PENALTY  # Penalty for waiting around
+            self.data.scoreChange += -TIME_PENALTY  # Penalty for waiting around
         else:
-            GhostRules.decrementTimer(state.data.agentStates[agentIndex])
+            GhostRules.decrementTimer(self.data.agentStates[agentIndex])
 
         # Resolve multi-agent effects
-        GhostRules.checkDeath(state, agentIndex)
+        GhostRules.checkDeath(self, agentIndex)
 
         # Book keeping
-        state.data._agentMoved = agentIndex
-        state.data.score += state.data.scoreChange
-        GameState.explored.add(self)
-        GameState.explored.add(state)
-        return state
+        self.data._agentMoved = agentIndex
+        self.data.score += self.data.scoreChange
+        self.data.updateAgentKeys()
 
     def getLegalPacmanActions(self):
         return self.getLegalActions(0)
@@ -183,7 +287,10 @@ class GameState:
         return self.data.capsules
 
     def getNumFood(self):
-        return self.data.food.count()
+        return self.data._numFood
+
+    def getNumCapsules(self):
+        return self.data._numCapsules
 
     def getFood(self):
         """
@@ -209,6 +316,16 @@ class GameState:
         """
         return self.data.layout.walls
 
+    def getMazeDistance(self, pos1, pos2):
+        """
+        Returns the number of steps on the shortest path between two
+        positions that avoids walls (infinity if there is none).
+
+        The distances between all pairs of cells are computed once per layout,
+        so this is as cheap as util.manhattanDistance.
+        """
+        return self.data.layout.mazeDistance(pos1, pos2)
+
     def hasFood(self, x, y):
         return self.data.food[x][y]
 
@@ -240,6 +357,13 @@ class GameState:
         state.data = self.data.deepCopy()
         return state
 
+    def key(self):
+        """
+        Returns a 64-bit Zobrist key for this state that is updated
+        incrementally as agents move and food or capsules are eaten.
+        """
+        return self.data.key()
+
     def __eq__(self, other):
         """
         Allows two states to be compared.
@@ -250,7 +374,7 @@ class GameState:
         """
         Allows states to be keys of dictionaries.
         """
-        return hash(self.data)
+        return self.data.key()
 
     def __str__(self):
 
@@ -283,11 +407,12 @@ class ClassicGameRules:
     def __init__(self, timeout=30):
         self.timeout = timeout
 
-    def newGame(self, layout, pacmanAgent, ghostAgents, display, quiet=False, catchExceptions=False):
+    def newGame(self, layout, pacmanAgent, ghostAgents, display, quiet=False, catchExceptions=False, fastSimulation=False):
         agents = [pacmanAgent] + ghostAgents[:layout.getNumGhosts()]
         initState = GameState()
         initState.initialize(layout, len(ghostAgents))
-        game = Game(agents, display, self, catchExceptions=catchExceptions)
+        game = Game(agents, display, self, catchExceptions=catchExceptions,
+                    fastSimulation=fastSimulation)
         game.state = initState
         self.initialState = initState.deepCopy()
         self.quiet = quiet
@@ -348,7 +473,7 @@ class PacmanRules:
         """
         Returns a list of possible actions.
         """
-        return Actions.getPossibleActions(state.getPacmanState().configuration, state.data.layout.walls)
+        return Actions.getPossibleActions(state.data.agentStates[0].configuration, state.data.layout.walls)
     getLegalActions = staticmethod(getLegalActions)
 
     def applyAction(state, action):
@@ -379,18 +504,21 @@ class PacmanRules:
         # Eat food
         if state.data.food[x][y]:
             state.data.scoreChange += 10
-            state.data.food = state.data.food.copy()
+            if not state.data._inPlace:
+                state.data.food = state.data.food.copy()
             state.data.food[x][y] = False
+            state.data._hashKey ^= zobristKey(('food', x, y))
             state.data._foodEaten = position
-            # TODO: cache numFood?
-            numFood = state.getNumFood()
-            if numFood == 0 and not state.data._lose:
+            state.data._numFood -= 1
+            if state.data._numFood == 0 and not state.data._lose:
                 state.data.scoreChange += 500
                 state.data._win = True
         # Eat capsule
         if(position in state.getCapsules()):
             state.data.capsules.remove(position)
+            state.data._hashKey ^= zobristKey(('capsule', position))
             state.data._capsuleEaten = position
+            state.data._numCapsules -= 1
             # Reset all ghosts' scared timers
             for index in range(1, len(state.data.agentStates)):
                 state.data.agentStates[index].scaredTimer = SCARED_TIME
@@ -409,6 +537,9 @@ class GhostRules:
         reach a dead end, but can turn 90 degrees at intersections.
         """
         conf = state.getGhostState(ghostIndex).configuration
+        legal = state.data.layout.getGhostActions(conf)
+        if legal is not None:
+            return legal
         possibleActions = Actions.getPossibleActions(
             conf, state.data.layout.walls)
         reverse = Actions.reverseDirection(conf.direction)
@@ -437,8 +568,11 @@ class GhostRules:
     def decrementTimer(ghostState):
         timer = ghostState.scaredTimer
         if timer == 1:
-            ghostState.configuration.pos = nearestPoint(
-                ghostState.configuration.pos)
+            # Configurations may be shared between states, so replace it
+            # rather than editing its position
+            configuration = ghostState.configuration
+            ghostState.configuration = Configuration.intern(
+                nearestPoint(configuration.pos), configuration.direction)
         ghostState.scaredTimer = max(0, timer - 1)
     decrementTimer = staticmethod(decrementTimer)
 
@@ -552,8 +686,12 @@ def readCommand(argv):
                       help=default('Time to delay between frames; <0 means keyboard'), default=0.1)
     parser.add_option('-c', '--catchExceptions', action='store_true', dest='catchExceptions',
                       help='Turns on exception handling and timeouts during games', default=False)
-    parser.add_option('--timeout', dest='timeout', type='int',
+    parser.add_option('--timeout', dest='timeout', type='float',
                       help=default('Maximum length of time an agent can spend computing in a single game'), default=30)
+    parser.add_option('--workers', dest='workers', type='int',
+                      help=default('Number of processes to play games in; games in workers are not displayed'), default=1)
+    parser.add_option('--fastSimulation', action='store_true', dest='fastSimulation',
+                      help='Hand agents the game state without copying it and skip null display calls (trusted agents only)', default=False)
 
     options, otherjunk = parser.parse_args(argv)
     if len(otherjunk) != 0:
@@ -606,6 +744,10 @@ def readCommand(argv):
     args['record'] = options.record
     args['catchExceptions'] = options.catchExceptions
     args['timeout'] = options.timeout
+    args['workers'] = options.workers
+    args['fastSimulation'] = options.fastSimulation
+    if options.fastSimulation and options.catchExceptions:
+        raise Exception('--fastSimulation cannot be combined with --catchExceptions')
 
     # Special case: recorded games don't use the runGames method or args structure
     if options.gameToReplay != None:
@@ -672,14 +814,78 @@ def replayGame(layout, actions, display):
     display.finish()
 
 
-def runGames(layout, pacman, ghosts, display, numGames, record, numTraining=0, catchExceptions=False, timeout=30):
+class GameSummary:
+    """
+    The outcome of a game played in a worker process.  It carries the parts
+    of a Game that runGames and the autograder look at (the final state,
+    timeouts and crashes), so it can stand in for the Game itself.
+    """
+
+    def __init__(self, index, seed, game, record=False):
+        self.index = index
+        self.seed = seed
+        self.state = game.state
+        self.agentTimeout = game.agentTimeout
+        self.agentCrashed = game.agentCrashed
+        self.numMoves = len(game.moveHistory)
+        self.moveHistory = game.moveHistory if record else None
+
+    def __str__(self):
+        outcome = ['Loss', 'Win'][int(self.state.isWin())]
+        if self.agentTimeout:
+            outcome += ' (timeout)'
+        if self.agentCrashed:
+            outcome += ' (crash)'
+        return 'Game %d (seed %d): %s, score %d after %d moves' % (
+            self.index + 1, self.seed, outcome, self.state.getScore(), self.numMoves)
+
+
+def playGame(index, seed, layout, pacman, ghosts, catchExceptions, timeout, record, fastSimulation=False):
+    """
+    Plays a single quiet game from a fixed seed; runs in a runGames worker.
+    """
+    import textDisplay
+    random.seed(seed)
+    rules = ClassicGameRules(timeout)
+    game = rules.newGame(layout, pacman, ghosts,
+                         textDisplay.NullGraphics(), True, catchExceptions, fastSimulation)
+    game.run()
+    return GameSummary(index, seed, game, record)
+
+
+def recordGame(layout, moveHistory, index):
+    import time
+    import pickle
+    fname = ('recorded-game-%d' % (index + 1)) + \
+        '-'.join([str(t) for t in time.localtime()[1:6]])
+    f = open(fname, 'wb')
+    components = {'layout': layout, 'actions': moveHistory}
+    pickle.dump(components, f)
+    f.close()
+
+
+def runGames(layout, pacman, ghosts, display, numGames, record, numTraining=0, catchExceptions=False, timeout=30, workers=1, fastSimulation=False):
+    """
+    Plays numGames games and prints a summary of the non-training ones.
+
+    With workers > 1 the training games are still played here, one after
+    another, and the remaining games are spread over a pool of processes.
+    Each of those games is seeded from the main random generator, so runs
+    that fix the random seed are reproducible, and is played without
+    graphics.  A line is printed for each game as it finishes and
+    GameSummary objects are returned in place of the games.
+
+    fastSimulation plays every game with Game.runFast, which skips the
+    per-turn state copies and null display calls (trusted agents only).
+    """
     import __main__
     __main__.__dict__['_display'] = display
 
     rules = ClassicGameRules(timeout)
     games = []
 
-    for i in range(numGames):
+    numSerial = numGames if workers <= 1 else numTraining
+    for i in range(numSerial):
         beQuiet = i < numTraining
         if beQuiet:
                 # Suppress output and graphics
@@ -690,20 +896,29 @@ def runGames(layout, pacman, ghosts, display, numGames, record, numTraining=0, c
             gameDisplay = display
             rules.quiet = False
         game = rules.newGame(layout, pacman, ghosts,
-                             gameDisplay, beQuiet, catchExceptions)
+                             gameDisplay, beQuiet, catchExceptions, fastSimulation)
         game.run()
         if not beQuiet:
             games.append(game)
 
         if record:
-            import time
-            import pickle
-            fname = ('recorded-game-%d' % (i + 1)) + \
-                '-'.join([str(t) for t in time.localtime()[1:6]])
-            f = file(fname, 'w')
-            components = {'layout': layout, 'actions': game.moveHistory}
-            pickle.dump(components, f)
-            f.close()
+            recordGame(layout, game.moveHistory, i)
+
+    if numSerial < numGames:
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        seeds = [random.randrange(2 ** 32) for i in range(numSerial, numGames)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(playGame, i, seed, layout, pacman, ghosts,
+                                   catchExceptions, timeout, record, fastSimulation)
+                       for i, seed in zip(range(numSerial, numGames), seeds)]
+            for future in as_completed(futures):
+                summary = future.result()
+                print(summary)
+                games.append(summary)
+        games.sort(key=lambda summary: summary.index)
+        if record:
+            for summary in games:
+                recordGame(layout, summary.moveHistory, summary.index)
 
     if (numGames-numTraining) > 0:
         scores = [game.state.getScore() for game in games]
@@ -0,0 +1,43 @@
+# test_multiAgents.py
+# -------------------
+# Regression tests for the search options of the agents in multiAgents.py.
+# Run with
+#   python -m unittest test_multiAgents
+
+import contextlib
+import io
+import random
+import unittest
+
+import ghostAgents
+import layout
+import multiAgents
+import pacman
+import textDisplay
+
+
+def playGame(agent, layoutName='smallClassic', seed='cs188'):
+    """Plays one quiet game against random ghosts and returns its moves."""
+    random.seed(seed)
+    lay = layout.getLayout(layoutName)
+    ghosts = [ghostAgents.RandomGhost(i + 1) for i in range(lay.getNumGhosts())]
+    with contextlib.redirect_stdout(io.StringIO()):
+        games = pacman.runGames(lay, agent, ghosts, textDisplay.NullGraphics(), 1, False)
+    return games[0].moveHistory
+
+
+class AlphaBetaAgentTest(unittest.TestCase):
+
+    def testOrderingKeepsTheChosenActions(self):
+        plain = playGame(multiAgents.AlphaBetaAgent(depth='2'))
+        ordered = playGame(multiAgents.AlphaBetaAgent(depth='2', ordering='1'))
+        self.assertEqual(plain, ordered)
+
+    def testParallelSearchChoosesTheSerialActions(self):
+        serial = playGame(multiAgents.AlphaBetaAgent(depth='2', ordering='1'))
+        parallel = playGame(multiAgents.AlphaBetaAgent(depth='2', ordering='1', workers='3'))
+        self.assertEqual(serial, parallel)
+
+
+if __name__ == '__main__':
+    unittest.main()
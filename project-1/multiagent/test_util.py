@@ -0,0 +1,71 @@
+# test_util.py
+# ------------
+# Regression tests for the per-move time limits in util.py. Run with
+#   python -m unittest test_util
+
+import threading
+import time
+import unittest
+
+import util
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class TimedCallTest(unittest.TestCase):
+
+    def assertTimesOut(self, timeout, runs):
+        start = time.perf_counter()
+        with self.assertRaises(util.TimeoutFunctionException):
+            util.timedCall(busy, timeout, runs)
+        return time.perf_counter() - start
+
+    def testReturnsResultAndTime(self):
+        result, elapsed = util.timedCall(max, 1.0, 3, 4)
+        self.assertEqual(result, 4)
+        self.assertLess(elapsed, 1.0)
+        self.assertIsNone(util.moveTimeLeft())
+
+    def testInterruptsOverrun(self):
+        self.assertLess(self.assertTimesOut(0.05, 5.0), 1.0)
+
+    def testNested(self):
+        def outer():
+            self.assertLessEqual(util.moveTimeLeft(), 0.1)
+            util.timedCall(busy, 5.0, 5.0)
+        start = time.perf_counter()
+        with self.assertRaises(util.TimeoutFunctionException):
+            util.timedCall(outer, 0.1)
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertIsNone(util.moveTimeLeft())
+
+    def testCallsFinishingAtTheDeadline(self):
+        # The timeout often lands while the call is being disarmed; the
+        # watchdog must stay usable afterwards, from any thread
+        for _ in range(3000):
+            try:
+                util.timedCall(busy, 0.0005, 0.0005)
+            except util.TimeoutFunctionException:
+                pass
+        self.assertLess(self.assertTimesOut(0.05, 0.5), 0.4)
+
+        errors = []
+
+        def other():
+            try:
+                self.assertLess(self.assertTimesOut(0.05, 0.5), 0.4)
+            except AssertionError as error:
+                errors.append(error)
+        thread = threading.Thread(target=other, daemon=True)
+        thread.start()
+        thread.join(2.0)
+        self.assertFalse(thread.is_alive(), 'timedCall hung in another thread')
+        self.assertEqual(errors, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
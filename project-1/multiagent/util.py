@@ -685,6 +685,186 @@ class TimeoutFunction:
         return result
 
 
+# Per-move time limits for agents. Unlike TimeoutFunction these are
+# reentrant, work in any thread and have sub-second resolution: time is
+# measured with time.perf_counter_ns, agents can check their deadline
+# cooperatively, and a single watchdog thread interrupts calls that overrun.
+import os
+import queue
+import threading
+
+try:
+    import ctypes
+    _setAsyncExc = ctypes.pythonapi.PyThreadState_SetAsyncExc
+except (ImportError, AttributeError):  # not CPython: overruns are caught on return
+    _setAsyncExc = None
+
+
+def _raiseInThread(threadId, exception):
+    # exception=None clears an exception that has not been raised yet
+    if _setAsyncExc is not None:
+        _setAsyncExc(ctypes.c_ulong(threadId),
+                     None if exception is None else ctypes.py_object(exception))
+
+
+class TimedCall:
+    """A call being watched: its deadline, the tighter deadline of any
+    enclosing call, the thread running it and whether it has finished."""
+
+    def __init__(self, deadline, limit, threadId):
+        self.deadline = deadline
+        self.limit = limit
+        self.threadId = threadId
+        self.lock = threading.RLock()  # held by the watchdog while it fires
+        self.running = True
+        self.fired = False
+
+
+class Watchdog:
+    """
+    Raises TimeoutFunctionException in threads whose deadline (a
+    time.perf_counter_ns value) has passed. Calls are handed to the watchdog
+    thread through a queue, and it sleeps until the earliest deadline.
+
+    The exception arrives asynchronously, so it may land after the call has
+    returned, while it is being disarmed. The caller therefore never waits on
+    a lock the watchdog needs: the watchdog only tries the call's own lock,
+    and fires only if the call is still running. Disarming clears the running
+    mark under that lock and any exception still pending, and is repeated if
+    a timeout lands part way through.
+    """
+
+    RETRY_NS = 1000000  # how soon to look again at a call being disarmed
+
+    def __init__(self):
+        self.requests = queue.SimpleQueue()
+        self.local = threading.local()
+        self.startLock = threading.Lock()
+        self.thread = None
+
+    def activeCalls(self):
+        """The calls this thread is inside of, innermost last."""
+        calls = getattr(self.local, 'calls', None)
+        if calls is None:
+            calls = self.local.calls = []
+        return calls
+
+    def arm(self, deadline):
+        """Watch a call this thread is about to make."""
+        if self.thread is None:
+            with self.startLock:
+                if self.thread is None:
+                    self.thread = threading.Thread(
+                        target=self.run, name='util.Watchdog', daemon=True)
+                    self.thread.start()
+        calls = self.activeCalls()
+        limit = deadline if not calls else min(deadline, calls[-1].limit)
+        call = TimedCall(deadline, limit, threading.get_ident())
+        calls.append(call)
+        self.requests.put(call)
+
+    def disarm(self, depth):
+        """
+        Stop watching the calls this thread armed since it was inside depth
+        calls. Returns True if the deadline of the outermost of them fired.
+        If a timeout interrupts it, calling it again finishes the job.
+        """
+        calls = self.activeCalls()
+        fired = False
+        while len(calls) > depth:
+            call = calls[-1]
+            with call.lock:
+                call.running = False
+            fired = call.fired
+            calls.pop()
+            # The call may have returned before the exception was raised
+            if fired:
+                _raiseInThread(call.threadId, None)
+        return fired
+
+    def run(self):
+        pending = []  # heap of (deadline, sequence number, call)
+        sequence = 0
+        while True:
+            timeout = None
+            if pending:
+                timeout = max(pending[0][0] - time.perf_counter_ns(), 0) / 1e9
+            try:
+                call = self.requests.get(timeout=timeout)
+            except queue.Empty:
+                pass
+            else:
+                heapq.heappush(pending, (call.deadline, sequence, call))
+                sequence += 1
+                continue
+            now = time.perf_counter_ns()
+            while pending and pending[0][0] <= now:
+                call = heapq.heappop(pending)[2]
+                if not call.running:
+                    continue
+                if not call.lock.acquire(blocking=False):
+                    heapq.heappush(pending, (now + self.RETRY_NS, sequence, call))
+                    sequence += 1
+                    continue
+                try:
+                    if call.running:
+                        call.fired = True
+                        _raiseInThread(call.threadId, TimeoutFunctionException)
+                finally:
+                    call.lock.release()
+
+
+_watchdog = Watchdog()
+
+
+def _resetWatchdog():
+    # A forked child does not inherit the watchdog thread
+    global _watchdog
+    _watchdog = Watchdog()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_resetWatchdog)
+
+
+def timedCall(function, timeout, *args):
+    """
+    Call function(*args) with timeout seconds (a float) to finish. Returns
+    (result, seconds taken); raises TimeoutFunctionException if the call ran
+    out of time. While it runs, moveTimeLeft() reports the time remaining.
+    """
+    start = time.perf_counter_ns()
+    depth = len(_watchdog.activeCalls())
+    try:
+        _watchdog.arm(start + int(timeout * 1e9))
+        result = function(*args)
+    finally:
+        while True:
+            try:
+                fired = _watchdog.disarm(depth)
+                break
+            except TimeoutFunctionException:
+                pass  # landed after the call returned
+    elapsed = time.perf_counter_ns() - start
+    if fired or elapsed > timeout * 1e9:
+        raise TimeoutFunctionException()
+    calls = _watchdog.activeCalls()
+    if calls and calls[-1].fired:
+        raise TimeoutFunctionException()  # the enclosing call's, caught above
+    return result, elapsed / 1e9
+
+
+def moveTimeLeft():
+    """
+    Seconds left before the innermost timedCall running in this thread times
+    out, or None outside of one. Agents can poll it to stop searching early.
+    """
+    calls = _watchdog.activeCalls()
+    if not calls:
+        return None
+    return (calls[-1].limit - time.perf_counter_ns()) / 1e9
+
+
 _ORIGINAL_STDOUT = None
 _ORIGINAL_STDERR = None
 _MUTED = False
@@ -1,7 +1,7 @@
 import time
 from collections import deque
 
-from csp_utils import is_safe_full
+from csp_utils import SearchTimeout, attack_mask, bits_of, check_deadline, is_safe_full
 
 
 def constraint_ok(col_i, row_i, col_j, row_j):
@@ -13,26 +13,62 @@ def constraint_ok(col_i, row_i, col_j, row_j):
     return True
 
 
-def revise(domains, xi, xj, n, metrics):
-    """Prune from domain[xi] any value that has no support in domain[xj]."""
+def revise(domains, xi, xj, n, metrics, trail=None):
+    """
+    Prune from domain[xi] any value that has no support in domain[xj].
+    If trail is given, domain[xi] is saved in it before its first pruning.
+    """
     removed = False
     to_remove = set()
+    checks = 0
     for vi in domains[xi]:
         supported = False
         for vj in domains[xj]:
-            metrics["ac3_checks"] = metrics.get("ac3_checks", 0) + 1
+            checks += 1
             if constraint_ok(xi, vi, xj, vj):
                 supported = True
                 break
         if not supported:
             to_remove.add(vi)
+    metrics["ac3_checks"] = metrics.get("ac3_checks", 0) + checks
     if to_remove:
+        if trail is not None:
+            save_domain(domains, xi, trail)
+            trail[0].add(xi) # pruned in place below
         domains[xi] -= to_remove
         removed = True
     return removed
 
 
-def ac3(domains, n, metrics=None):
+def save_domain(domains, var, trail):
+    """Record the domain of var on the trail unless this level already did."""
+    saved = trail[-1]
+    if var not in saved:
+        saved[var] = domains[var].copy()
+
+
+def undo_level(domains, trail):
+    """
+    Restore the domains saved by the innermost trail level and drop it.
+
+    The trail is [dirty, level, level, ...]: each level maps a column to a
+    copy of its domain taken before the first pruning at that level, and
+    dirty holds the columns whose live domain has been pruned in place since
+    it was last copied. Those are replaced by fresh copies as well, so every
+    domain iterates in the same order as when each level restored a full
+    copy of all domains; revise() stops at the first support it finds, so
+    ac3_checks depends on that order.
+    """
+    dirty = trail[0]
+    for var, domain in trail.pop().items():
+        domains[var] = domain
+        dirty.discard(var)
+    for var in dirty:
+        domains[var] = domains[var].copy()
+    dirty.clear()
+
+
+def ac3(domains, n, metrics=None, trail=None):
     if metrics is None:
         metrics = {}
     metrics.setdefault("ac3_checks", 0)
@@ -45,7 +81,7 @@ def ac3(domains, n, metrics=None):
 
     while queue:
         xi, xj = queue.popleft()
-        if revise(domains, xi, xj, n, metrics):
+        if revise(domains, xi, xj, n, metrics, trail):
             if not domains[xi]:
                 return False
             for xk in range(n):
@@ -75,28 +111,179 @@ def select_unassigned_variable_mrv(domains, assignment):
     return best_var
 
 
-def solve_backtracking_ac3(n):
+def iter_backtracking_ac3(n, metrics=None, deadline=None):
+    """
+    Yield (solution, metrics snapshot) for every solution, in the order the
+    search finds them. metrics, if given, is updated live and holds the final
+    counts once the generator is exhausted or closed. The search stops early,
+    setting metrics["timed_out"], once time.perf_counter() passes deadline.
+    """
+    if metrics is None:
+        metrics = {}
+    # ac3_checks records the total number of pairwise checks AC-3 performs
+    metrics.update(explored_nodes=0, checked_assignments=0, ac3_checks=0,
+                   runtime=0.0, timed_out=False)
     # create one domain per column
     # initially every column can place a queen in every row
     domains = [set(range(n)) for _ in range(n)] # every column can place a queen in any row initially
     assignment = [None] * n # None marks unassigned columns
+    trail = [set()] # saved domains per search level, see undo_level
+    start = time.perf_counter()
+
+    def backtrack():
+        if all(v is not None for v in assignment):
+            # fully assigned board, so count and validate it
+            metrics["checked_assignments"] += 1
+            if is_safe_full(assignment):
+                metrics["runtime"] = time.perf_counter() - start
+                yield list(assignment), dict(metrics)
+            return
+
+        check_deadline(deadline)
+        # Select the next column to assign using MRV
+        var = select_unassigned_variable_mrv(domains, assignment)
+        if var is None:
+            return
+
+        for value in sorted(domains[var]):
+            metrics["explored_nodes"] += 1
+
+            # Open a trail level so we can restore on backtracking
+            trail.append({})
+            old_assignment_value = assignment[var]
+
+            assignment[var] = value
+            save_domain(domains, var, trail)
+            domains[var] = {value} # commit to this row choice before enforcing arc consistency
+
+            if ac3(domains, n, metrics, trail):
+                yield from backtrack()
+
+            assignment[var] = old_assignment_value
+            undo_level(domains, trail)
+
+    try:
+        yield from backtrack()
+    except SearchTimeout:
+        metrics["timed_out"] = True
+    metrics["runtime"] = time.perf_counter() - start
+
+
+def solve_backtracking_ac3(n):
+    # stop the search at the first solution
+    metrics = {}
+    solutions = iter_backtracking_ac3(n, metrics)
+    solution, _ = next(solutions, (None, None))
+    solutions.close()
+
+    return {
+        "method": "Backtracking + AC-3 (MRV)",
+        "N": n,
+        "solution": solution,
+        "explored_nodes": metrics["explored_nodes"],
+        "checked_assignments": metrics["checked_assignments"],
+        "ac3_checks": metrics["ac3_checks"],
+        "runtime": metrics["runtime"],
+    }
+
+
+# AC-2001: arc consistency that remembers, for each (column, row, other
+# column), the last row of the other column found to support it. Supports are
+# only searched for again, from that row onwards, once it has been pruned.
+
+# A queen rules out at most this many rows of any other column, so a row
+# always has a support in a column with more rows left than that.
+MAX_CONFLICTS = 3
+
+
+def revise_ac2001(domains, xi, xj, last, support_trail):
+    """
+    Prune from domain[xi] any value without support in domain[xj], resuming
+    the search for each value's support after its cached last support.
+    Support updates are pushed onto support_trail so they can be undone.
+    Returns the set of pruned values and the number of constraint checks.
+    """
+    domain_j = domains[xj]
+    to_remove = set()
+    checks = 0
+    candidates = sorted(domain_j)
+    for vi in domains[xi]:
+        key = (xi, vi, xj)
+        support = last.get(key, -1)
+        if support in domain_j:
+            continue # the cached support is still there
+        found = None
+        for vj in candidates:
+            if vj <= support:
+                continue # checked before, when the support was found
+            checks += 1
+            if constraint_ok(xi, vi, xj, vj):
+                found = vj
+                break
+        if found is None:
+            to_remove.add(vi)
+        else:
+            support_trail.append((key, support))
+            last[key] = found
+    return to_remove, checks
+
+
+def ac2001(domains, n, changed, last, trail, support_trail):
+    """
+    Propagate the pruning of the columns in changed. Only arcs pointing at a
+    column whose domain changed are revised, and only once that column is
+    down to MAX_CONFLICTS rows; before then every row keeps a support in it.
+    Returns (consistent, checks).
+    """
+    queue = deque(changed)
+    queued = set(changed)
+    checks = 0
+    while queue:
+        xj = queue.popleft()
+        queued.discard(xj)
+        if len(domains[xj]) > MAX_CONFLICTS:
+            continue
+        for xi in range(n):
+            if xi == xj:
+                continue
+            to_remove, revise_checks = revise_ac2001(
+                domains, xi, xj, last, support_trail
+            )
+            checks += revise_checks
+            if to_remove:
+                domains[xi] -= to_remove
+                trail.append((xi, to_remove))
+                if not domains[xi]:
+                    return False, checks
+                if xi not in queued:
+                    queued.add(xi)
+                    queue.append(xi)
+    return True, checks
+
+
+def solve_backtracking_ac2001(n):
+    # Same search as solve_backtracking_ac3, maintaining arc consistency with
+    # AC-2001. The pruning is the same, so the search tree is too.
+    domains = [set(range(n)) for _ in range(n)]
+    assignment = [None] * n
+    trail = [] # (column, removed rows) for every pruning on the current path
+    last = {} # (column, row, other column) -> last support found
+    support_trail = [] # (key, previous support) for every update of last
     explored_nodes = 0
     checked_assignments = 0
-    metrics = {"ac3_checks": 0} # record the total number of pairwise checks AC-3 performs
+    ac_checks = 0
     solution = None
 
-    def backtrack():
-        nonlocal explored_nodes, checked_assignments, solution
+    def backtrack(depth=0):
+        nonlocal explored_nodes, checked_assignments, ac_checks, solution
 
         if all(v is not None for v in assignment):
-            # fully assigned board, so count and validate it
             checked_assignments += 1
             if is_safe_full(assignment):
                 solution = list(assignment)
                 return True
             return False
 
-        # Select the next column to assign using MRV
         var = select_unassigned_variable_mrv(domains, assignment)
         if var is None:
             return False
@@ -104,20 +291,150 @@ def solve_backtracking_ac3(n):
         for value in sorted(domains[var]):
             explored_nodes += 1
 
-            # Save current state so we can restore on backtracking
-            old_domains = [d.copy() for d in domains]
+            mark, support_mark = len(trail), len(support_trail)
             old_assignment_value = assignment[var]
 
             assignment[var] = value
-            domains[var] = {value} # commit to this row choice before enforcing arc consistency
+            if len(domains[var]) > 1:
+                removed = domains[var] - {value}
+                domains[var] -= removed
+                trail.append((var, removed))
+
+            # Below the root the other domains are already arc consistent, so
+            # only arcs into var need revising; the first assignment checks
+            # every arc, like AC-3 does
+            changed = [var] if depth else list(range(n))
+            consistent, checks = ac2001(
+                domains, n, changed, last, trail, support_trail
+            )
+            ac_checks += checks
+            if consistent and backtrack(depth + 1):
+                return True
+
+            assignment[var] = old_assignment_value
+            while len(trail) > mark:
+                col, removed = trail.pop()
+                domains[col] |= removed
+            while len(support_trail) > support_mark:
+                key, support = support_trail.pop()
+                last[key] = support
+
+        return False
 
-            if ac3(domains, n, metrics):
+    start = time.perf_counter()
+    backtrack()
+    end = time.perf_counter()
+
+    return {
+        "method": "Backtracking + AC-2001 (MRV)",
+        "N": n,
+        "solution": solution,
+        "explored_nodes": explored_nodes,
+        "checked_assignments": checked_assignments,
+        "ac3_checks": ac_checks,
+        "runtime": end - start,
+    }
+
+
+# Bitmask domains: domains[col] is an int with bit r set while row r is allowed
+
+def revise_bitmask(domains, xi, xj, metrics, trail):
+    """
+    Prune from domain[xi] any row that has no support in domain[xj]. A row is
+    supported when domain[xj] has a bit left outside the cells it attacks, so
+    each row costs one check instead of a scan of domain[xj].
+    """
+    domain_j = domains[xj]
+    metrics["ac3_checks"] += domains[xi].bit_count()
+    if domain_j.bit_count() > MAX_CONFLICTS:
+        return False # every row still has a support (see MAX_CONFLICTS)
+    distance = abs(xi - xj)
+    to_remove = 0
+    for vi in bits_of(domains[xi]):
+        if not domain_j & ~attack_mask(vi, distance):
+            to_remove |= 1 << vi
+    if to_remove:
+        trail.append((xi, domains[xi]))
+        domains[xi] &= ~to_remove
+        return True
+    return False
+
+
+def ac3_bitmask(domains, n, metrics, trail):
+    queue = deque()
+    for i in range(n):
+        for j in range(n):
+            if i != j:
+                queue.append((i, j))
+
+    while queue:
+        xi, xj = queue.popleft()
+        if revise_bitmask(domains, xi, xj, metrics, trail):
+            if not domains[xi]:
+                return False
+            for xk in range(n):
+                if xk != xi and xk != xj:
+                    queue.append((xk, xi))
+    return True
+
+
+def select_unassigned_variable_mrv_bitmask(domains, assignment):
+    best_var = None
+    best_size = None
+    for var, val in enumerate(assignment):
+        if val is not None:
+            continue
+        size = domains[var].bit_count()
+        if best_var is None or size < best_size:
+            best_var = var
+            best_size = size
+    return best_var
+
+
+def solve_backtracking_ac3_bitmask(n):
+    # Same search as solve_backtracking_ac3, with bitmask domains. The pruning
+    # (and so the search tree) is identical; ac3_checks counts one support
+    # test per row and arc.
+    domains = [(1 << n) - 1 for _ in range(n)]
+    assignment = [None] * n
+    trail = [] # (column, domain before pruning) for every change on the current path
+    explored_nodes = 0
+    checked_assignments = 0
+    metrics = {"ac3_checks": 0}
+    solution = None
+
+    def backtrack():
+        nonlocal explored_nodes, checked_assignments, solution
+
+        if all(v is not None for v in assignment):
+            checked_assignments += 1
+            if is_safe_full(assignment):
+                solution = list(assignment)
+                return True
+            return False
+
+        var = select_unassigned_variable_mrv_bitmask(domains, assignment)
+        if var is None:
+            return False
+
+        for value in bits_of(domains[var]):
+            explored_nodes += 1
+
+            mark = len(trail)
+            old_assignment_value = assignment[var]
+
+            assignment[var] = value
+            trail.append((var, domains[var]))
+            domains[var] = 1 << value
+
+            if ac3_bitmask(domains, n, metrics, trail):
                 if backtrack():
                     return True
 
             assignment[var] = old_assignment_value
-            for i in range(n):
-                domains[i] = old_domains[i]
+            while len(trail) > mark:
+                col, domain = trail.pop()
+                domains[col] = domain
 
         return False
 
@@ -126,7 +443,7 @@ def solve_backtracking_ac3(n):
     end = time.perf_counter()
 
     return {
-        "method": "Backtracking + AC-3 (MRV)",
+        "method": "Backtracking + AC-3 (MRV, bitmask)",
         "N": n,
         "solution": solution,
         "explored_nodes": explored_nodes,
@@ -136,4 +453,9 @@ def solve_backtracking_ac3(n):
     }
 
 
-__all__ = ["solve_backtracking_ac3"]
+__all__ = [
+    "iter_backtracking_ac3",
+    "solve_backtracking_ac3",
+    "solve_backtracking_ac2001",
+    "solve_backtracking_ac3_bitmask",
+]
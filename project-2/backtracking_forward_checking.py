@@ -1,14 +1,20 @@
 import time
 
-from csp_utils import is_safe_full
+from csp_utils import SearchTimeout, attack_mask, bits_of, check_deadline, is_safe_full
 
 
-def forward_check(domains, var, value, n, assignment):
-    """Forward checking to prune inconsistent values after assigning var=value."""
-    new_domains = [d.copy() for d in domains]
+def forward_check(domains, var, value, n, assignment, trail):
+    """
+    Forward checking to prune inconsistent values after assigning var=value.
+    Domains are pruned in place and every pruning is pushed onto trail as a
+    (column, removed rows) pair so that undo_to can restore it.
+    """
     consistency_checks = 0
 
-    new_domains[var] = {value}
+    if len(domains[var]) > 1:
+        removed = domains[var] - {value}
+        domains[var] -= removed
+        trail.append((var, removed))
     assignment[var] = value
 
     for other in range(n):
@@ -16,7 +22,7 @@ def forward_check(domains, var, value, n, assignment):
             continue
 
         to_remove = set()
-        for row in new_domains[other]:
+        for row in domains[other]:
             consistency_checks += 1
             same_row = row == value
             same_diag = abs(row - value) == abs(other - var)
@@ -24,11 +30,19 @@ def forward_check(domains, var, value, n, assignment):
                 to_remove.add(row)
 
         if to_remove:
-            new_domains[other] -= to_remove
-            if not new_domains[other]:
-                return new_domains, consistency_checks, True
+            domains[other] -= to_remove
+            trail.append((other, to_remove))
+            if not domains[other]:
+                return consistency_checks, True
 
-    return new_domains, consistency_checks, False
+    return consistency_checks, False
+
+
+def undo_to(domains, trail, mark):
+    """Put back every pruning recorded on trail since it had length mark."""
+    while len(trail) > mark:
+        var, removed = trail.pop()
+        domains[var] |= removed
 
 
 def select_unassigned_variable_mrv(domains, assignment):
@@ -52,12 +66,141 @@ def select_unassigned_variable_mrv(domains, assignment):
     return best_var
 
 
-def solve_backtracking_forward_checking(n):
+def iter_backtracking_forward_checking(n, metrics=None, deadline=None):
+    """
+    Yield (solution, metrics snapshot) for every solution, in the order the
+    search finds them. metrics, if given, is updated live and holds the final
+    counts once the generator is exhausted or closed. The search stops early,
+    setting metrics["timed_out"], once time.perf_counter() passes deadline.
+    """
+    if metrics is None:
+        metrics = {}
+    metrics.update(explored_nodes=0, checked_assignments=0,
+                   consistency_checks=0, runtime=0.0, timed_out=False)
     # create one domain per column
     # initially every column can place a queen in every row
     # forward checking will shrink these sets as we assign queens
     domains = [set(range(n)) for _ in range(n)]
     assignment = [None] * n # build the current partial assignment list
+    trail = [] # (column, removed rows) for every pruning on the current path
+    start = time.perf_counter()
+
+    def backtrack():
+        # check whether the search has reached a full assignment
+        # all(...) checks if every column has an assigned row
+        if all(v is not None for v in assignment):
+            metrics["checked_assignments"] += 1
+            if is_safe_full(assignment):
+                metrics["runtime"] = time.perf_counter() - start
+                yield list(assignment), dict(metrics) # assignment[col] = row
+            return
+
+        check_deadline(deadline)
+        var = select_unassigned_variable_mrv(domains, assignment)
+        if var is None:
+            return # no legal rows
+
+        # For this column, try every row that is still allowed, one by one
+        for value in sorted(domains[var]):
+            metrics["explored_nodes"] += 1
+
+            # Remember where the trail ends so this choice can be undone
+            mark = len(trail)
+            old_assignment_value = assignment[var]
+
+            checks, failure = forward_check(
+                domains, var, value, n, assignment, trail
+            )
+            metrics["consistency_checks"] += checks
+
+            if not failure:
+                yield from backtrack()
+
+            assignment[var] = old_assignment_value
+            undo_to(domains, trail, mark)
+
+    try:
+        yield from backtrack()
+    except SearchTimeout:
+        metrics["timed_out"] = True
+    metrics["runtime"] = time.perf_counter() - start
+
+
+def solve_backtracking_forward_checking(n):
+    # stop the search at the first solution
+    metrics = {}
+    solutions = iter_backtracking_forward_checking(n, metrics)
+    solution, _ = next(solutions, (None, None))
+    solutions.close()
+
+    return {
+        "method": "Backtracking + Forward Checking (MRV)",
+        "N": n,
+        "solution": solution,
+        "explored_nodes": metrics["explored_nodes"],
+        "checked_assignments": metrics["checked_assignments"],
+        "consistency_checks": metrics["consistency_checks"],
+        "runtime": metrics["runtime"],
+    }
+
+
+# Bitmask domains: domains[col] is an int with bit r set while row r is allowed
+
+def forward_check_bitmask(domains, var, value, n, assignment, trail):
+    """
+    Forward checking on bitmask domains: each column loses the row and the two
+    diagonal cells attacked by var=value with a single and-not. Replaced
+    domains are pushed onto trail as (column, old domain) pairs.
+    """
+    consistency_checks = 0
+
+    if domains[var] != 1 << value:
+        trail.append((var, domains[var]))
+        domains[var] = 1 << value
+    assignment[var] = value
+
+    for other in range(n):
+        if other == var or assignment[other] is not None:
+            continue
+
+        domain = domains[other]
+        consistency_checks += domain.bit_count() # same count as checking each row
+        pruned = domain & ~attack_mask(value, abs(other - var))
+
+        if pruned != domain:
+            trail.append((other, domain))
+            domains[other] = pruned
+            if not pruned:
+                return consistency_checks, True
+
+    return consistency_checks, False
+
+
+def undo_to_bitmask(domains, trail, mark):
+    """Put back every domain replaced since trail had length mark."""
+    while len(trail) > mark:
+        var, domain = trail.pop()
+        domains[var] = domain
+
+
+def select_unassigned_variable_mrv_bitmask(domains, assignment):
+    best_var = None
+    best_size = None
+    for var, val in enumerate(assignment):
+        if val is not None:
+            continue
+        size = domains[var].bit_count()
+        if best_var is None or size < best_size:
+            best_var = var
+            best_size = size
+    return best_var
+
+
+def solve_backtracking_forward_checking_bitmask(n):
+    # Same search as solve_backtracking_forward_checking, with bitmask domains
+    domains = [(1 << n) - 1 for _ in range(n)]
+    assignment = [None] * n
+    trail = [] # (column, domain before pruning) for every change on the current path
     explored_nodes = 0
     checked_assignments = 0
     consistency_checks = 0
@@ -66,46 +209,33 @@ def solve_backtracking_forward_checking(n):
     def backtrack():
         nonlocal explored_nodes, checked_assignments, consistency_checks, solution
 
-        # check whether the search has reached a full assignment
-        # all(...) checks if every column has an assigned row
         if all(v is not None for v in assignment):
             checked_assignments += 1
             if is_safe_full(assignment):
-                solution = list(assignment) # assignment[col] = row
+                solution = list(assignment)
                 return True
             return False
 
-        var = select_unassigned_variable_mrv(domains, assignment)
+        var = select_unassigned_variable_mrv_bitmask(domains, assignment)
         if var is None:
-            return False # no legal rows
+            return False
 
-        # For this column, try every row that is still allowed, one by one
-        for value in sorted(domains[var]):
+        for value in bits_of(domains[var]):
             explored_nodes += 1
 
-            old_domains = [d.copy() for d in domains]
+            mark = len(trail)
             old_assignment_value = assignment[var]
 
-            # copy list because we dont want to modify the real assignment yet
-            # update the real assignment after forward checking confirms that the move is valid
-            tmp_assignment = assignment[:]
-            new_domains, checks, failure = forward_check(
-                old_domains, var, value, n, tmp_assignment
+            checks, failure = forward_check_bitmask(
+                domains, var, value, n, assignment, trail
             )
             consistency_checks += checks
-            if failure:
-                continue
 
-            for i in range(n):
-                domains[i] = new_domains[i].copy()
-            assignment[var] = value
-
-            if backtrack():
+            if not failure and backtrack():
                 return True
 
             assignment[var] = old_assignment_value
-            for i in range(n):
-                domains[i] = old_domains[i]
+            undo_to_bitmask(domains, trail, mark)
 
         return False
 
@@ -114,7 +244,7 @@ def solve_backtracking_forward_checking(n):
     end = time.perf_counter()
 
     return {
-        "method": "Backtracking + Forward Checking (MRV)",
+        "method": "Backtracking + Forward Checking (MRV, bitmask)",
         "N": n,
         "solution": solution,
         "explored_nodes": explored_nodes,
@@ -124,4 +254,8 @@ def solve_backtracking_forward_checking(n):
     }
 
 
-__all__ = ["solve_backtracking_forward_checking"]
+__all__ = [
+    "iter_backtracking_forward_checking",
+    "solve_backtracking_forward_checking",
+    "solve_backtracking_forward_checking_bitmask",
+]
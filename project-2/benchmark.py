@@ -0,0 +1,189 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import random
+import sys
+
+from backtracking_ac3 import (
+    solve_backtracking_ac2001,
+    solve_backtracking_ac3,
+    solve_backtracking_ac3_bitmask,
+)
+from backtracking_forward_checking import (
+    solve_backtracking_forward_checking,
+    solve_backtracking_forward_checking_bitmask,
+)
+from min_conflicts import min_conflicts
+from local_search import simulated_annealing, tabu_search
+from naive_enumeration import solve_counting, solve_naive
+from nqueens_model import (
+    solve_engine_ac3,
+    solve_engine_forward_checking,
+    solve_engine_min_conflicts,
+)
+
+try:
+    import resource
+except ImportError: # not available on Windows
+    resource = None
+
+
+def solve_counting_serial(n):
+    # Benchmarks time one process per run
+    return solve_counting(n, workers=1)
+
+
+SOLVERS = {
+    "naive": solve_naive,
+    "count": solve_counting_serial,
+    "fc": solve_backtracking_forward_checking,
+    "fc-bitmask": solve_backtracking_forward_checking_bitmask,
+    "ac3": solve_backtracking_ac3,
+    "ac3-bitmask": solve_backtracking_ac3_bitmask,
+    "ac2001": solve_backtracking_ac2001,
+    "min-conflicts": min_conflicts,
+    "tabu": tabu_search,
+    "annealing": simulated_annealing,
+    "engine-fc": solve_engine_forward_checking,
+    "engine-ac3": solve_engine_ac3,
+    "engine-min-conflicts": solve_engine_min_conflicts,
+}
+
+# Columns of every output row; metrics a solver does not report are left empty
+FIELDS = [
+    "solver", "N", "run", "seed", "status", "solved", "runtime",
+    "explored_nodes", "checked_assignments", "consistency_checks",
+    "ac3_checks", "steps", "valid_solutions", "peak_rss_kb",
+]
+METRICS = [
+    "runtime", "explored_nodes", "checked_assignments", "consistency_checks",
+    "ac3_checks", "steps", "valid_solutions",
+]
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process in KiB, if the OS reports it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak //= 1024 # bytes on macOS, KiB elsewhere
+    return peak
+
+
+def run_solver(conn, solver, n, seed):
+    # Runs in the child process; sends back the metrics, not the solution
+    try:
+        random.seed(seed)
+        res = SOLVERS[solver](n)
+        row = {key: res.get(key) for key in METRICS}
+        row["solved"] = res.get("solution") is not None
+        row["status"] = "ok"
+    except Exception as e:
+        row = {"status": f"error: {type(e).__name__}: {e}"}
+    row["peak_rss_kb"] = peak_rss_kb()
+    conn.send(row)
+    conn.close()
+
+
+def benchmark_run(solver, n, seed, timeout):
+    """
+    Run one solver on one N in a fresh process, killing it after timeout
+    seconds. Returns a row with every field in FIELDS.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    recv_conn, send_conn = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=run_solver, args=(send_conn, solver, n, seed))
+    proc.start()
+    send_conn.close()
+
+    row = {"status": "timeout"}
+    if recv_conn.poll(timeout):
+        try:
+            row = recv_conn.recv()
+        except EOFError: # the child died without reporting
+            row = {"status": "crashed"}
+    proc.terminate()
+    proc.join()
+    recv_conn.close()
+
+    row.update({"solver": solver, "N": n, "seed": seed})
+    return {field: row.get(field) for field in FIELDS}
+
+
+def parse_ns(values):
+    """Parse N values such as 8, 4-12 (inclusive) or 8-32:8 (with a step)."""
+    ns = []
+    for value in values:
+        span, _, step = value.partition(":")
+        low, _, high = span.partition("-")
+        low = int(low)
+        high = int(high) if high else low
+        ns.extend(range(low, high + 1, int(step) if step else 1))
+    return ns
+
+
+class RowWriter:
+    """Writes rows as JSON lines or CSV, flushing after each one."""
+
+    def __init__(self, out, fmt):
+        self.out = out
+        self.csv = None
+        if fmt == "csv":
+            self.csv = csv.DictWriter(out, fieldnames=FIELDS)
+            self.csv.writeheader()
+
+    def write(self, row):
+        if self.csv is not None:
+            self.csv.writerow(row)
+        else:
+            self.out.write(json.dumps(row) + "\n")
+        self.out.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="nQueensCSPs.py bench",
+        description="Benchmark the N-Queens solvers over a range of N.",
+    )
+    parser.add_argument("-n", "--n", nargs="+", default=["4-12"],
+                        help="N values: 8, 4-12 or 8-32:8 (default: 4-12)")
+    parser.add_argument("-s", "--solvers", default="fc,ac3,min-conflicts",
+                        help="comma separated solvers from: " + ", ".join(SOLVERS))
+    parser.add_argument("-r", "--repeat", type=int, default=3,
+                        help="runs per solver and N (default: 3)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the first run; run i uses seed + i (default: 0)")
+    parser.add_argument("-t", "--timeout", type=float, default=60.0,
+                        help="seconds before a run is killed (default: 60)")
+    parser.add_argument("-f", "--format", choices=["json", "csv"], default="json",
+                        help="JSON lines or CSV (default: json)")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    solvers = [name.strip() for name in args.solvers.split(",") if name.strip()]
+    unknown = [name for name in solvers if name not in SOLVERS]
+    if unknown:
+        parser.error("unknown solver(s): " + ", ".join(unknown))
+    ns = parse_ns(args.n)
+
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        writer = RowWriter(out, args.format)
+        for solver in solvers:
+            for n in ns:
+                for run in range(args.repeat):
+                    row = benchmark_run(solver, n, args.seed + run, args.timeout)
+                    row["run"] = run
+                    writer.write(row)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+__all__ = ["benchmark_run", "main", "SOLVERS", "FIELDS"]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+import random
+import time
+from collections import deque
+
+from csp_utils import SearchTimeout, bits_of, check_deadline
+
+
+class CSP:
+    """
+    A binary constraint satisfaction problem over variables 0..n-1.
+
+    domains[x] lists the values of variable x, in the order they are tried,
+    and neighbors[x] the variables sharing a constraint with x (symmetric).
+    The constraints are given in one of three ways:
+
+    - constraint(xi, vi, xj, vj) -> bool, a predicate on two assignments;
+    - constraint as a table {(xi, xj): set of allowed (vi, vj) pairs};
+    - compatible(xi, i, xj) -> int, the bitmask of the indices in
+      domains[xj] compatible with domains[xi][i].
+
+    The solvers only use the bitmask form. Predicates and tables are turned
+    into it lazily, one (xi, i, xj) at a time, and the masks are cached.
+    Models that can compute the masks directly (like N-Queens) should pass
+    compatible, which skips the cache and is the fast path.
+
+    max_conflicts, if known, is the most values of a neighbor that a single
+    value can rule out. Arc consistency then skips arcs whose other end still
+    has more values than that, as every value is sure to have a support.
+    """
+
+    def __init__(self, domains, neighbors, constraint=None, compatible=None,
+                 max_conflicts=None):
+        if (constraint is None) == (compatible is None):
+            raise ValueError("give exactly one of constraint and compatible")
+        self.domains = [list(values) for values in domains]
+        self.neighbors = [list(adjacent) for adjacent in neighbors]
+        self.n = len(self.domains)
+        self.max_conflicts = max_conflicts
+
+        if compatible is not None:
+            self.compatible = compatible
+            return
+
+        if isinstance(constraint, dict):
+            constraint = table_constraint(constraint)
+        cache = {}
+
+        def cached_compatible(xi, i, xj):
+            key = (xi, i, xj)
+            mask = cache.get(key)
+            if mask is None:
+                vi = self.domains[xi][i]
+                mask = 0
+                for j, vj in enumerate(self.domains[xj]):
+                    if constraint(xi, vi, xj, vj):
+                        mask |= 1 << j
+                cache[key] = mask
+            return mask
+
+        self.compatible = cached_compatible
+
+    def full_domains(self):
+        """Bitmask domains with every value allowed."""
+        return [(1 << len(values)) - 1 for values in self.domains]
+
+    def values(self, assignment):
+        """Map value indices back to values."""
+        return [self.domains[x][i] for x, i in enumerate(assignment)]
+
+    def is_consistent(self, assignment):
+        """Check that a complete assignment of value indices breaks no constraint."""
+        compatible = self.compatible
+        for x, i in enumerate(assignment):
+            for y in self.neighbors[x]:
+                if y > x and not compatible(x, i, y) >> assignment[y] & 1:
+                    return False
+        return True
+
+
+def table_constraint(table):
+    """Turn {(xi, xj): allowed (vi, vj) pairs} into a constraint predicate."""
+    def constraint(xi, vi, xj, vj):
+        if (xi, xj) in table:
+            return (vi, vj) in table[(xi, xj)]
+        if (xj, xi) in table:
+            return (vj, vi) in table[(xj, xi)]
+        return True
+    return constraint
+
+
+def select_unassigned_variable_mrv(domains, assignment):
+    # Pick the variable with the fewest values left; ties go to the lowest index
+    best_var = None
+    best_size = None
+    for var, val in enumerate(assignment):
+        if val is not None:
+            continue
+        size = domains[var].bit_count()
+        if best_var is None or size < best_size:
+            best_var = var
+            best_size = size
+    return best_var
+
+
+def forward_check(csp, domains, var, i, assignment, trail):
+    """
+    Keep in every unassigned neighbor of var only the values compatible with
+    var = value i. Replaced domains are pushed onto trail as (variable, old
+    domain). Returns (checks, failure); checks counts the values examined.
+    """
+    compatible = csp.compatible
+    checks = 0
+    for other in csp.neighbors[var]:
+        if assignment[other] is not None:
+            continue
+        domain = domains[other]
+        checks += domain.bit_count()
+        pruned = domain & compatible(var, i, other)
+        if pruned != domain:
+            trail.append((other, domain))
+            domains[other] = pruned
+            if not pruned:
+                return checks, True
+    return checks, False
+
+
+def revise(csp, domains, xi, xj, trail):
+    """
+    Remove from domains[xi] the values with no support left in domains[xj].
+    Returns (removed, checks); checks counts one support test per value.
+    """
+    domain_j = domains[xj]
+    checks = domains[xi].bit_count()
+    if csp.max_conflicts is not None and domain_j.bit_count() > csp.max_conflicts:
+        return False, checks
+    compatible = csp.compatible
+    to_remove = 0
+    for i in bits_of(domains[xi]):
+        if not compatible(xi, i, xj) & domain_j:
+            to_remove |= 1 << i
+    if to_remove:
+        trail.append((xi, domains[xi]))
+        domains[xi] &= ~to_remove
+    return bool(to_remove), checks
+
+
+def ac3(csp, domains, trail):
+    """Enforce arc consistency on every arc. Returns (consistent, checks)."""
+    neighbors = csp.neighbors
+    queue = deque((xi, xj) for xi in range(csp.n) for xj in neighbors[xi])
+    checks = 0
+    while queue:
+        xi, xj = queue.popleft()
+        removed, revise_checks = revise(csp, domains, xi, xj, trail)
+        checks += revise_checks
+        if removed:
+            if not domains[xi]:
+                return False, checks
+            for xk in neighbors[xi]:
+                if xk != xj:
+                    queue.append((xk, xi))
+    return True, checks
+
+
+def iter_backtracking(csp, inference="fc", metrics=None, deadline=None):
+    """
+    Backtracking search with MRV, yielding (solution, metrics snapshot) for
+    every solution in the order it is found. inference is "fc" (forward
+    checking), "ac3" (maintain arc consistency) or None. metrics, if given,
+    is updated live: explored_nodes, checked_assignments and
+    consistency_checks or ac3_checks. The search stops early, setting
+    metrics["timed_out"], once time.perf_counter() passes deadline.
+    """
+    if inference not in ("fc", "ac3", None):
+        raise ValueError(f"unknown inference {inference!r}")
+    if metrics is None:
+        metrics = {}
+    checks_key = "ac3_checks" if inference == "ac3" else "consistency_checks"
+    metrics.update({"explored_nodes": 0, "checked_assignments": 0, checks_key: 0,
+                    "runtime": 0.0, "timed_out": False})
+    n = csp.n
+    domains = csp.full_domains()
+    assignment = [None] * n
+    trail = [] # (variable, domain before pruning) for every change on the current path
+    start = time.perf_counter()
+
+    def backtrack():
+        if all(v is not None for v in assignment):
+            metrics["checked_assignments"] += 1
+            if csp.is_consistent(assignment):
+                metrics["runtime"] = time.perf_counter() - start
+                yield csp.values(assignment), dict(metrics)
+            return
+
+        check_deadline(deadline)
+        var = select_unassigned_variable_mrv(domains, assignment)
+        if var is None:
+            return
+
+        for i in bits_of(domains[var]):
+            metrics["explored_nodes"] += 1
+
+            mark = len(trail)
+            assignment[var] = i
+            if domains[var] != 1 << i:
+                trail.append((var, domains[var]))
+                domains[var] = 1 << i
+
+            if inference == "fc":
+                checks, failure = forward_check(csp, domains, var, i, assignment, trail)
+                consistent = not failure
+            elif inference == "ac3":
+                consistent, checks = ac3(csp, domains, trail)
+            else:
+                consistent, checks = True, 0
+            metrics[checks_key] += checks
+
+            if consistent:
+                yield from backtrack()
+
+            assignment[var] = None
+            while len(trail) > mark:
+                x, domain = trail.pop()
+                domains[x] = domain
+
+    try:
+        yield from backtrack()
+    except SearchTimeout:
+        metrics["timed_out"] = True
+    metrics["runtime"] = time.perf_counter() - start
+
+
+def solve_backtracking(csp, inference="fc"):
+    """Run iter_backtracking to the first solution; returns a result dict."""
+    metrics = {}
+    solutions = iter_backtracking(csp, inference, metrics)
+    solution, _ = next(solutions, (None, None))
+    solutions.close()
+    metrics.pop("timed_out")
+    return dict(metrics, solution=solution)
+
+
+def min_conflicts(csp, max_steps=100000, deadline=None):
+    """
+    Min-conflicts local search from a random complete assignment. For every
+    variable x and value index i it keeps conflicts[x][i], the neighbors
+    whose current value is incompatible with x = i. Choosing a value reads
+    one such list, and moving a variable only updates its neighbors, from
+    the bitmasks of the values they rule out. The conflicted variables are
+    kept in a list with a position index, so one is drawn in O(1). Returns
+    a result dict with the same metrics as the N-Queens min_conflicts.
+    """
+    start = time.perf_counter()
+    n = csp.n
+    compatible = csp.compatible
+    neighbors = csp.neighbors
+    sizes = [len(values) for values in csp.domains]
+    full = csp.full_domains()
+    assignment = [random.randrange(size) for size in sizes]
+    explored_nodes = 0
+    checked_assignments = 0
+
+    def ruled_out(x, i, y):
+        # value indices of y incompatible with x = value i
+        return full[y] & ~compatible(x, i, y)
+
+    conflicts = [[0] * size for size in sizes]
+    for x in range(n):
+        for y in neighbors[x]:
+            counts = conflicts[y]
+            for j in bits_of(ruled_out(x, assignment[x], y)):
+                counts[j] += 1
+
+    conflicted = [] # variables whose current value has conflicts
+    position = {} # variable -> index in conflicted
+
+    def mark(x, is_conflicted):
+        if is_conflicted:
+            if x not in position:
+                position[x] = len(conflicted)
+                conflicted.append(x)
+        elif x in position:
+            # swap x with the last entry and drop it
+            index = position.pop(x)
+            last = conflicted.pop()
+            if last != x:
+                conflicted[index] = last
+                position[last] = index
+
+    for x in range(n):
+        mark(x, conflicts[x][assignment[x]] > 0)
+    steps = max_steps
+
+    for step in range(max_steps):
+        if deadline is not None and not step & 1023 and time.perf_counter() > deadline:
+            steps = step
+            break
+        checked_assignments += 1
+        if not conflicted:
+            return {
+                "solution": csp.values(assignment),
+                "explored_nodes": explored_nodes,
+                "checked_assignments": checked_assignments,
+                "steps": step,
+                "runtime": time.perf_counter() - start,
+            }
+
+        var = random.choice(conflicted)
+        counts = conflicts[var]
+        explored_nodes += sizes[var]
+        best_conf = min(counts)
+        best_values = [i for i, conf in enumerate(counts) if conf == best_conf]
+
+        # Move var, updating the conflict counts of its neighbors
+        old = assignment[var]
+        new = random.choice(best_values)
+        if new == old:
+            continue
+        assignment[var] = new
+        for y in neighbors[var]:
+            before = ruled_out(var, old, y)
+            after = ruled_out(var, new, y)
+            if before == after:
+                continue
+            counts = conflicts[y]
+            for j in bits_of(before):
+                counts[j] -= 1
+            for j in bits_of(after):
+                counts[j] += 1
+            if (before ^ after) >> assignment[y] & 1:
+                mark(y, counts[assignment[y]] > 0)
+        mark(var, best_conf > 0)
+
+    return {
+        "solution": None,
+        "explored_nodes": explored_nodes,
+        "checked_assignments": checked_assignments,
+        "steps": steps,
+        "runtime": time.perf_counter() - start,
+    }
+
+
+__all__ = [
+    "CSP",
+    "table_constraint",
+    "iter_backtracking",
+    "solve_backtracking",
+    "min_conflicts",
+]
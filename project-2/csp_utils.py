@@ -1,25 +1,115 @@
+import time
+from collections import Counter
+
+
+try:
+    import numpy as np
+except ImportError: # optional; only used to validate very large boards
+    np = None
+
+# Boards at least this large are validated with NumPy when it is installed
+NUMPY_MIN_N = 4096
+
+
 # takes a complete board assignment
 # checks if any two queens attack each other
 def is_safe_full(assignment):
     """Check if a complete assignment is a valid N-Queens solution."""
     n = len(assignment)
+    if np is not None and n >= NUMPY_MIN_N:
+        return is_safe_full_numpy(assignment)
 
-    # Loop over each queen by its column c1
-    for c1 in range(n):
-        r1 = assignment[c1] # row of queen in c1
-
-        # Compare queen of c1 with every queen after it (c2)
-        for c2 in range(c1 + 1, n):
-            r2 = assignment[c2]
-            
-            # row conflict
-            if r1 == r2:
-                return False
-            
-            # diagonal conflict
-            if abs(r1 - r2) == abs(c1 - c2):
-                return False
+    # One queen per column by construction, so the board is safe exactly when
+    # no two queens share a row, a diagonal (row - col) or an anti-diagonal
+    # (row + col): mark the lines taken instead of comparing every pair, and
+    # stop at the first line taken twice
+    rows = bytearray(n)
+    diagonals = bytearray(2 * n) # indexed by row - col + n
+    anti_diagonals = bytearray(2 * n)
+    for c, r in enumerate(assignment):
+        if not 0 <= r < n or rows[r]:
+            return False
+        d = r - c + n
+        a = r + c
+        if diagonals[d] or anti_diagonals[a]:
+            return False
+        rows[r] = diagonals[d] = anti_diagonals[a] = 1
     return True
 
+
+def is_safe_full_numpy(assignment):
+    """is_safe_full with the line occupancy counted by NumPy."""
+    rows = np.asarray(assignment, dtype=np.int64)
+    n = len(rows)
+    if n and (rows.min() < 0 or rows.max() >= n):
+        return False
+    cols = np.arange(n, dtype=np.int64)
+    for lines in (rows, rows - cols, rows + cols):
+        if len(lines) and np.bincount(lines - lines.min()).max() > 1:
+            return False
+    return True
+
+
+def conflicting_pairs(assignment):
+    """
+    List every pair of queens sharing a row, diagonal or anti-diagonal, as
+    (c1, c2) with c1 < c2, sorted. Rows are not checked against 0..n-1:
+    for boards with every row in range the list is empty exactly when
+    is_safe_full(assignment) holds, while out-of-range rows fail
+    is_safe_full without adding pairs. Costs O(n) to group the queens by
+    line plus O(p log p) to sort the p pairs reported.
+    """
+    n = len(assignment)
+    pairs = []
+    for lines in (
+        list(assignment),
+        [r - c for c, r in enumerate(assignment)],
+        [r + c for c, r in enumerate(assignment)],
+    ):
+        # Only lines holding two or more queens contribute pairs
+        crowded = {line for line, k in Counter(lines).items() if k > 1}
+        if not crowded:
+            continue
+        groups = {}
+        for c in range(n):
+            if lines[c] in crowded:
+                groups.setdefault(lines[c], []).append(c)
+        # Two queens in different columns share at most one line, so no pair repeats
+        for cols in groups.values():
+            for i, c1 in enumerate(cols):
+                for c2 in cols[i + 1:]:
+                    pairs.append((c1, c2))
+    pairs.sort()
+    return pairs
+
+
+class SearchTimeout(Exception):
+    """Raised inside a search generator when its deadline has passed."""
+
+
+def check_deadline(deadline):
+    """Raise SearchTimeout once time.perf_counter() is past deadline (if any)."""
+    if deadline is not None and time.perf_counter() > deadline:
+        raise SearchTimeout
+
+# Bitmask domains: bit r of a column's domain is set when row r is still allowed
+
+def attack_mask(row, distance):
+    """Bitmask of the rows attacked by a queen in row, distance columns away."""
+    mask = (1 << row) | (1 << (row + distance))
+    if row >= distance:
+        mask |= 1 << (row - distance)
+    return mask
+
+
+def bits_of(mask):
+    """List the rows set in a bitmask domain, in increasing order."""
+    rows = []
+    while mask:
+        low = mask & -mask
+        rows.append(low.bit_length() - 1)
+        mask ^= low
+    return rows
+
 # expose the module(s) for wildcard imports (from csp_utils import *) 
-__all__ = ["is_safe_full"]
+__all__ = ["is_safe_full", "conflicting_pairs", "SearchTimeout", "check_deadline", "attack_mask", "bits_of"]
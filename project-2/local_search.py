@@ -0,0 +1,170 @@
+import math
+import random
+import time
+
+from min_conflicts import greedy_placement, stopped
+
+
+# Steps a queen may not return to the row it just left
+TABU_TENURE = 10
+# Simulated annealing temperature schedule: start, decay per step, floor
+START_TEMPERATURE = 2.0
+COOLING = 0.9995
+MIN_TEMPERATURE = 0.05
+
+
+def line_counts(board):
+    """Queens on every row, diagonal (row - col) and anti-diagonal (row + col)."""
+    n = len(board)
+    row_count = [0] * n
+    diag_count = [0] * (2 * n - 1)
+    anti_count = [0] * (2 * n - 1)
+    for col, row in enumerate(board):
+        row_count[row] += 1
+        diag_count[row - col + n - 1] += 1
+        anti_count[row + col] += 1
+    return row_count, diag_count, anti_count
+
+
+def total_conflicts(counts):
+    """Number of attacking pairs on the board counted by line_counts."""
+    return sum(k * (k - 1) // 2 for lines in counts for k in lines)
+
+
+def move_queen(board, counts, col, row):
+    n = len(board)
+    row_count, diag_count, anti_count = counts
+    old = board[col]
+    row_count[old] -= 1
+    diag_count[old - col + n - 1] -= 1
+    anti_count[old + col] -= 1
+    board[col] = row
+    row_count[row] += 1
+    diag_count[row - col + n - 1] += 1
+    anti_count[row + col] += 1
+
+
+def result(method, n, board, solved, explored_nodes, checked_assignments, steps, start):
+    return {
+        "method": method,
+        "N": n,
+        "solution": board if solved else None,
+        "explored_nodes": explored_nodes,
+        "checked_assignments": checked_assignments,
+        "steps": steps,
+        "runtime": time.perf_counter() - start,
+    }
+
+
+def tabu_search(n, max_steps=100000, deadline=None, stop=None, tenure=TABU_TENURE):
+    """
+    Min-conflicts with a tabu list: a moved queen may not go back to the row
+    it left for tenure steps, unless that move solves the board. Each step
+    scans the board, so this suits N up to a few thousand.
+    """
+    start = time.perf_counter()
+    offset = n - 1
+    board = greedy_placement(n)
+    counts = line_counts(board)
+    row_count, diag_count, anti_count = counts
+    conflicts = total_conflicts(counts)
+    tabu = {} # (col, row) -> first step at which the move is allowed again
+    explored_nodes = 0
+    checked_assignments = 0
+    steps = max_steps
+
+    for step in range(max_steps):
+        if not step & 1023 and stopped(deadline, stop):
+            steps = step
+            break
+        checked_assignments += 1
+        if conflicts == 0:
+            return result("Tabu search", n, board, True, explored_nodes,
+                          checked_assignments, step, start)
+
+        attacked = [
+            c for c in range(n)
+            if row_count[board[c]] + diag_count[board[c] - c + offset]
+            + anti_count[board[c] + c] > 3
+        ]
+        col = random.choice(attacked)
+        row = board[col]
+        current = row_count[row] + diag_count[row - col + offset] + anti_count[row + col] - 3
+
+        best_rows = []
+        best_conf = None
+        for r in range(n):
+            if r == row:
+                continue
+            explored_nodes += 1
+            conf = row_count[r] + diag_count[r - col + offset] + anti_count[r + col]
+            if tabu.get((col, r), 0) > step and conflicts - current + conf > 0:
+                continue
+            if best_conf is None or conf < best_conf:
+                best_conf = conf
+                best_rows = [r]
+            elif conf == best_conf:
+                best_rows.append(r)
+        if not best_rows:
+            continue # every other row is tabu
+
+        tabu[(col, row)] = step + tenure
+        move_queen(board, counts, col, random.choice(best_rows))
+        conflicts += best_conf - current
+
+    return result("Tabu search", n, board, False, explored_nodes,
+                  checked_assignments, steps, start)
+
+
+def simulated_annealing(n, max_steps=100000, deadline=None, stop=None):
+    """
+    Move a random attacked queen to a random row, always accepting moves that
+    do not add conflicts and accepting worse ones with probability
+    exp(-delta / temperature), as the temperature cools geometrically. Steps
+    are cheap but many are needed, so this suits N up to a few hundred.
+    """
+    start = time.perf_counter()
+    offset = n - 1
+    board = greedy_placement(n)
+    counts = line_counts(board)
+    row_count, diag_count, anti_count = counts
+    conflicts = total_conflicts(counts)
+    temperature = START_TEMPERATURE
+    explored_nodes = 0
+    checked_assignments = 0
+    steps = max_steps
+
+    for step in range(max_steps):
+        if not step & 1023 and stopped(deadline, stop):
+            steps = step
+            break
+        checked_assignments += 1
+        if conflicts == 0:
+            return result("Simulated annealing", n, board, True, explored_nodes,
+                          checked_assignments, step, start)
+        temperature = max(temperature * COOLING, MIN_TEMPERATURE)
+
+        # Sample columns until one is attacked (a few draws unless N is huge
+        # and the board nearly solved)
+        while True:
+            col = random.randrange(n)
+            row = board[col]
+            if row_count[row] + diag_count[row - col + offset] + anti_count[row + col] > 3:
+                break
+        r = random.randrange(n - 1)
+        if r >= row:
+            r += 1 # any row but the current one
+        explored_nodes += 1
+
+        current = row_count[row] + diag_count[row - col + offset] + anti_count[row + col] - 3
+        conf = row_count[r] + diag_count[r - col + offset] + anti_count[r + col]
+        delta = conf - current
+        if delta <= 0 or random.random() < math.exp(-delta / temperature):
+            move_queen(board, counts, col, r)
+            conflicts += delta
+
+    return result("Simulated annealing", n, board, False, explored_nodes,
+                  checked_assignments, steps, start)
+
+
+__all__ = ["tabu_search", "simulated_annealing"]
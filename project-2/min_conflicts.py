@@ -2,6 +2,13 @@ import random
 import time
 
 
+# Above this size a repair step scores a random sample of rows instead of all n
+FULL_SCAN_LIMIT = 1024
+SAMPLED_ROWS = 32
+# Random rows tried per column by the greedy initial placement
+INIT_ATTEMPTS = 128
+
+
 def conflicts_for_column(board, col):
     """Count how many attacking queens the queen in column col currently has."""
     n = len(board)
@@ -16,66 +23,234 @@ def conflicts_for_column(board, col):
     return conflicts
 
 
-def min_conflicts(n, max_steps=100000):
-    board = [random.randrange(n) for _ in range(n)] # start with a random row for every column
+def stopped(deadline, stop):
+    """True once time.perf_counter() is past deadline or stop is set (either may be None)."""
+    if deadline is not None and time.perf_counter() > deadline:
+        return True
+    return stop is not None and stop.is_set()
+
+
+def greedy_placement(n):
+    """
+    Place one queen per column, drawing rows from a shrinking pool so that no
+    two queens share a row, and prefer rows whose diagonals are still empty.
+    """
+    if n == 0:
+        return [] # the empty board; there are no diagonals to track
+    board = [0] * n
+    free_rows = list(range(n))
+    remaining = n
+    diag_used = bytearray(2 * n - 1)
+    anti_used = bytearray(2 * n - 1)
+    rand = random.random
+    for col in range(n):
+        for _ in range(INIT_ATTEMPTS):
+            i = int(rand() * remaining)
+            row = free_rows[i]
+            if not diag_used[row - col + n - 1] and not anti_used[row + col]:
+                break
+        # remove the chosen row from the pool (swap with the last free row)
+        remaining -= 1
+        free_rows[i] = free_rows[remaining]
+        board[col] = row
+        diag_used[row - col + n - 1] = 1
+        anti_used[row + col] = 1
+    return board
+
+
+def min_conflicts(n, max_steps=100000, deadline=None, stop=None):
+    # deadline (a time.perf_counter() value) ends the search early, unsolved,
+    # and so does stop (e.g. a multiprocessing.Event) once it is set
+    start = time.perf_counter()
+
+    board = greedy_placement(n)
     explored_nodes = 0
     checked_assignments = 0
 
-    start = time.perf_counter()
+    # Occupancy counters for every row, diagonal (row - col) and anti-diagonal
+    # (row + col), plus the sum of the columns of the queens on each line. The
+    # queen in column c is attacked when one of its lines holds another queen,
+    # and on a line holding exactly two queens the sum identifies the other one.
+    offset = n - 1
+    row_count = [0] * n
+    diag_count = [0] * (2 * n - 1)
+    anti_count = [0] * (2 * n - 1)
+    row_cols = [0] * n
+    diag_cols = [0] * (2 * n - 1)
+    anti_cols = [0] * (2 * n - 1)
+    for col, row in enumerate(board):
+        row_count[row] += 1
+        diag_count[row - col + offset] += 1
+        anti_count[row + col] += 1
+        row_cols[row] += col
+        diag_cols[row - col + offset] += col
+        anti_cols[row + col] += col
+
+    # Number of attacking pairs; the board is a solution when it reaches 0
+    total_conflicts = 0
+    for counts in (row_count, diag_count, anti_count):
+        for k in counts:
+            total_conflicts += k * (k - 1) // 2
+
+    # Every attacked queen is in conflicted_cols (flagged in listed). Entries
+    # can go stale when another move resolves their conflict; they are skipped
+    # when drawn.
+    conflicted_cols = [
+        c for c in range(n)
+        if row_count[board[c]] + diag_count[board[c] - c + offset]
+        + anti_count[board[c] + c] > 3
+    ]
+    listed = bytearray(n)
+    for c in conflicted_cols:
+        listed[c] = 1
+    # Rows left empty by earlier moves. The initial placement puts exactly one
+    # queen in every row, so these are the only rows a queen can move to
+    # without a row conflict, and a random sample of rows would miss them.
+    empty_rows = []
+    sampled = n > FULL_SCAN_LIMIT
+    rand = random.random
+    steps = max_steps
 
     for step in range(max_steps): # perform up to max_steps repair iterations
+        if not step & 1023 and stopped(deadline, stop):
+            steps = step
+            break
         checked_assignments += 1
 
-        # Track which columns currently violate constraints
-        conflicted_cols = [c for c in range(n) if conflicts_for_column(board, c) > 0]
-
-        if not conflicted_cols:
+        if total_conflicts == 0:
             end = time.perf_counter()
             # board is a valid solution because no queens threaten each other
             return {
                 "method": "Min-Conflicts local search",
                 "N": n,
-                "solution": list(board),
+                "solution": board,
                 "explored_nodes": explored_nodes,
                 "checked_assignments": checked_assignments,
                 "steps": step,
                 "runtime": end - start,
             }
 
-        col = random.choice(conflicted_cols) # pick one conflicted queen to move
+        # pick one conflicted queen to move
+        while True:
+            i = int(rand() * len(conflicted_cols))
+            col = conflicted_cols[i]
+            conflicted_cols[i] = conflicted_cols[-1]
+            conflicted_cols.pop()
+            listed[col] = 0
+            row = board[col]
+            if row_count[row] + diag_count[row - col + offset] + anti_count[row + col] > 3:
+                break
+
+        # Take the queen off the board, then score candidate rows in O(1) each
+        d, a = row - col + offset, row + col
+        row_count[row] -= 1
+        diag_count[d] -= 1
+        anti_count[a] -= 1
+        row_cols[row] -= col
+        diag_cols[d] -= col
+        anti_cols[a] -= col
+        total_conflicts -= row_count[row] + diag_count[d] + anti_count[a]
+
+        if sampled:
+            if row_count[row] == 0:
+                empty_rows.append(row)
+            empty_rows = [r for r in empty_rows if row_count[r] == 0]
+            candidates = [int(rand() * n) for _ in range(SAMPLED_ROWS)]
+            candidates.extend(empty_rows)
+            if row_count[row] != 0:
+                candidates.append(row)
+        else:
+            candidates = range(n)
 
         best_rows = []
         best_conf = None
-        for row in range(n):
+        for r in candidates:
             explored_nodes += 1
-            conf = 0
-            # Count conflicts if this queen is moved to 'row'
-            for c2 in range(n):
-                if c2 == col:
-                    continue
-                r2 = board[c2]
-                if r2 == row or abs(r2 - row) == abs(c2 - col):
-                    conf += 1
+            conf = row_count[r] + diag_count[r - col + offset] + anti_count[r + col]
             if best_conf is None or conf < best_conf:
                 best_conf = conf
-                best_rows = [row]
+                best_rows = [r]
             elif conf == best_conf:
-                best_rows.append(row)
+                best_rows.append(r)
 
         # Move the queen to one of the rows with minimum conflicts (ties broken uniformly)
-        board[col] = random.choice(best_rows)
+        row = random.choice(best_rows)
+        board[col] = row
+        d, a = row - col + offset, row + col
+        total_conflicts += best_conf
+        if best_conf > 0:
+            # The queen is still attacked, and so is any queen that was alone
+            # on one of the lines it joined
+            attacked = [col]
+            if row_count[row] == 1:
+                attacked.append(row_cols[row])
+            if diag_count[d] == 1:
+                attacked.append(diag_cols[d])
+            if anti_count[a] == 1:
+                attacked.append(anti_cols[a])
+            for c in attacked:
+                if not listed[c]:
+                    listed[c] = 1
+                    conflicted_cols.append(c)
+        row_count[row] += 1
+        diag_count[d] += 1
+        anti_count[a] += 1
+        row_cols[row] += col
+        diag_cols[d] += col
+        anti_cols[a] += col
 
     end = time.perf_counter()
-    # Ran out of steps without finding a conflict-free assignment
+    # Ran out of steps (or time) without finding a conflict-free assignment
     return {
         "method": "Min-Conflicts local search",
         "N": n,
         "solution": None,
         "explored_nodes": explored_nodes,
         "checked_assignments": checked_assignments,
-        "steps": max_steps,
+        "steps": steps,
         "runtime": end - start,
     }
 
 
-__all__ = ["min_conflicts"]
+def iter_min_conflicts(n, max_steps=100000, metrics=None, deadline=None, max_restarts=None,
+                       max_failures=10):
+    """
+    Yield (solution, metrics snapshot) for the solution of every successful
+    restart of min_conflicts. Restarts are independent, so a solution may
+    repeat. metrics, if given, is updated live with the totals over all
+    restarts. Stops after max_restarts restarts, if given, once
+    time.perf_counter() passes deadline, setting metrics["timed_out"], or
+    after max_failures restarts in a row find nothing (as for N = 2 or 3,
+    which have no solution), like the portfolio workers. max_failures=None
+    removes that bound, but then max_restarts or deadline must be given.
+    """
+    if max_failures is None and max_restarts is None and deadline is None:
+        raise ValueError("give max_failures, max_restarts or deadline to bound the search")
+    if metrics is None:
+        metrics = {}
+    metrics.update(explored_nodes=0, checked_assignments=0, steps=0,
+                   restarts=0, runtime=0.0, timed_out=False)
+    start = time.perf_counter()
+    failures = 0
+
+    while max_restarts is None or metrics["restarts"] < max_restarts:
+        if deadline is not None and time.perf_counter() > deadline:
+            metrics["timed_out"] = True
+            break
+        if max_failures is not None and failures >= max_failures:
+            break
+        res = min_conflicts(n, max_steps, deadline)
+        metrics["restarts"] += 1
+        for key in ("explored_nodes", "checked_assignments", "steps"):
+            metrics[key] += res[key]
+        metrics["runtime"] = time.perf_counter() - start
+        if res["solution"] is None:
+            failures += 1
+        else:
+            failures = 0
+            yield res["solution"], dict(metrics)
+
+    metrics["runtime"] = time.perf_counter() - start
+
+
+__all__ = ["iter_min_conflicts", "min_conflicts"]
@@ -1,10 +1,18 @@
 import sys
 import time
 
-from backtracking_ac3 import solve_backtracking_ac3
-from backtracking_forward_checking import solve_backtracking_forward_checking
+from backtracking_ac3 import (
+    solve_backtracking_ac2001,
+    solve_backtracking_ac3,
+    solve_backtracking_ac3_bitmask,
+)
+from backtracking_forward_checking import (
+    solve_backtracking_forward_checking,
+    solve_backtracking_forward_checking_bitmask,
+)
 from min_conflicts import min_conflicts
-from naive_enumeration import solve_naive
+from naive_enumeration import solve_counting, solve_naive
+from portfolio import solve_portfolio
 
 
 # Printing helpers
@@ -50,6 +58,12 @@ def time_str():
 
 # Main
 def main():
+    # python nQueensCSPs.py bench ... runs the benchmark harness instead
+    if sys.argv[1:2] == ["bench"]:
+        from benchmark import main as bench_main
+        bench_main(sys.argv[2:])
+        return
+
     ns = []
     # read command-line arguments and  collect all valid integer args
     for arg in sys.argv[1:]:
@@ -58,6 +72,27 @@ def main():
     if not ns: # list is empty
         ns = [8]
 
+    # --bitmask runs the backtracking solvers on integer bitmask domains
+    if "--bitmask" in sys.argv[1:]:
+        solve_fc = solve_backtracking_forward_checking_bitmask
+        solve_ac3 = solve_backtracking_ac3_bitmask
+    else:
+        solve_fc = solve_backtracking_forward_checking
+        solve_ac3 = solve_backtracking_ac3
+
+    # --ac2001 maintains arc consistency with AC-2001, which is fast enough
+    # to run for every N
+    ac2001 = "--ac2001" in sys.argv[1:]
+    if ac2001:
+        solve_ac3 = solve_backtracking_ac2001
+
+    # --count replaces naive enumeration with parallel bitmask counting
+    count = "--count" in sys.argv[1:]
+
+    # --portfolio races min-conflicts, tabu search and simulated annealing
+    # restarts across processes instead of a single min-conflicts run
+    portfolio = "--portfolio" in sys.argv[1:]
+
     print(f"Run started at {time_str()}")
 
     for n in ns:
@@ -65,7 +100,15 @@ def main():
         print(f"N-Queens with N = {n}")
         print("-" * 40)
 
-        if n <= 10:
+        if count and n <= 18:
+            print(f"[{time_str()}] Running Bitmask counting...")
+            count_res = solve_counting(n)
+            print_result(count_res)
+        elif count:
+            print(
+                f"[{time_str()}] Skipping Bitmask counting for N = {n} (too slow)."
+            )
+        elif n <= 10:
             print(f"[{time_str()}] Running Naive enumeration...")
             naive_res = solve_naive(n)
             print_result(naive_res)
@@ -75,20 +118,28 @@ def main():
             )
 
         print(f"[{time_str()}] Running Backtracking + Forward Checking (MRV)...")
-        fc_res = solve_backtracking_forward_checking(n)
+        fc_res = solve_fc(n)
         print_result(fc_res)
 
-        if n <= 24:
+        if ac2001:
+            print(f"[{time_str()}] Running Backtracking + AC-2001 (MRV)...")
+            ac3_res = solve_ac3(n)
+            print_result(ac3_res)
+        elif n <= 24:
             print(f"[{time_str()}] Running Backtracking + AC-3 (MRV)...")
-            ac3_res = solve_backtracking_ac3(n)
+            ac3_res = solve_ac3(n)
             print_result(ac3_res)
         else:
             print(
                 f"[{time_str()}] Skipping Backtracking + AC-3 for N = {n} (very slow)."
             )
 
-        print(f"[{time_str()}] Running Min-Conflicts local search...")
-        mc_res = min_conflicts(n)
+        if portfolio:
+            print(f"[{time_str()}] Running Local search portfolio...")
+            mc_res = solve_portfolio(n, strategies=("min-conflicts", "tabu", "annealing"))
+        else:
+            print(f"[{time_str()}] Running Min-Conflicts local search...")
+            mc_res = min_conflicts(n)
         print_result(mc_res)
 
     print(f"Run finished at {time_str()}")
@@ -1,6 +1,8 @@
+import os
 import time
+from concurrent.futures import ProcessPoolExecutor
 
-from csp_utils import is_safe_full
+from csp_utils import SearchTimeout, check_deadline, is_safe_full
 
 
 def solve_naive(n):
@@ -48,4 +50,177 @@ def solve_naive(n):
     }
 
 
-__all__ = ["solve_naive"]
+def iter_naive(n, metrics=None, deadline=None):
+    """
+    Yield (solution, metrics snapshot) for every valid board, in the order
+    solve_naive enumerates them. metrics, if given, is updated live and holds
+    the final counts once the generator is exhausted or closed. The search
+    stops early, setting metrics["timed_out"], once time.perf_counter()
+    passes deadline.
+    """
+    if metrics is None:
+        metrics = {}
+    metrics.update(explored_nodes=0, checked_assignments=0, valid_solutions=0,
+                   runtime=0.0, timed_out=False)
+    board = [0] * n
+    start = time.perf_counter()
+
+    def backtrack(col):
+        if col == n - 1:
+            # last column: every row completes a board to check
+            for row in range(n):
+                board[col] = row
+                metrics["explored_nodes"] += 1
+                metrics["checked_assignments"] += 1
+                if is_safe_full(board):
+                    metrics["valid_solutions"] += 1
+                    metrics["runtime"] = time.perf_counter() - start
+                    yield list(board), dict(metrics)
+            return
+
+        check_deadline(deadline)
+        for row in range(n):
+            board[col] = row
+            metrics["explored_nodes"] += 1
+            yield from backtrack(col + 1)
+
+    try:
+        if n == 0:
+            metrics["checked_assignments"] += 1
+            metrics["valid_solutions"] += 1
+            yield [], dict(metrics)
+        else:
+            yield from backtrack(0)
+    except SearchTimeout:
+        metrics["timed_out"] = True
+    metrics["runtime"] = time.perf_counter() - start
+
+
+# Counting mode: a permutation search over bitmasks. cols marks the rows that
+# already hold a queen, and ld / rd the rows attacked along the two diagonals
+# in the current column; each is shifted by one on moving to the next column.
+
+def place_prefix(n, prefix):
+    """Return (cols, ld, rd) after placing prefix, or None if it is unsafe."""
+    full = (1 << n) - 1
+    cols = ld = rd = 0
+    for row in prefix:
+        bit = 1 << row
+        if bit & (cols | ld | rd):
+            return None
+        cols, ld, rd = cols | bit, ((ld | bit) << 1) & full, (rd | bit) >> 1
+    return cols, ld, rd
+
+
+def count_completions(n, prefix):
+    """
+    Count the solutions whose first columns hold the rows in prefix.
+    Returns (solutions, placements made below the prefix).
+    """
+    masks = place_prefix(n, prefix)
+    if masks is None:
+        return 0, 0
+    full = (1 << n) - 1
+    solutions = 0
+    placements = 0
+
+    def search(cols, ld, rd, remaining):
+        nonlocal solutions, placements
+        avail = full & ~(cols | ld | rd)
+        if remaining == 1:
+            # every free row of the last column completes a solution
+            k = avail.bit_count()
+            solutions += k
+            placements += k
+            return
+        while avail:
+            bit = avail & -avail
+            avail ^= bit
+            placements += 1
+            search(cols | bit, ((ld | bit) << 1) & full, (rd | bit) >> 1, remaining - 1)
+
+    remaining = n - len(prefix)
+    if remaining == 0:
+        return 1, 0
+    search(*masks, remaining)
+    return solutions, placements
+
+
+def symmetry_tasks(n):
+    """
+    Split the search into (prefix, weight) tasks using the mirror symmetry
+    row -> n - 1 - row: only first-column rows in the lower half are searched
+    and counted twice. For odd n, boards with the first queen in the middle
+    row are split on the second column the same way. Boards of size 0 and 1
+    have a single solution and a single task.
+    """
+    if n <= 1:
+        return [(tuple(range(n)), 1)]
+    tasks = [((row,), 2) for row in range(n // 2)]
+    if n % 2:
+        mid = n // 2
+        tasks += [((mid, row), 2) for row in range(mid)]
+    return tasks
+
+
+def first_solution(n):
+    """The lexicographically first solution (board[col] = row), or None."""
+    full = (1 << n) - 1
+    board = []
+
+    def search(cols, ld, rd):
+        if len(board) == n:
+            return True
+        avail = full & ~(cols | ld | rd)
+        while avail:
+            bit = avail & -avail
+            avail ^= bit
+            board.append(bit.bit_length() - 1)
+            if search(cols | bit, ((ld | bit) << 1) & full, (rd | bit) >> 1):
+                return True
+            board.pop()
+        return False
+
+    return list(board) if search(0, 0, 0) else None
+
+
+def solve_counting(n, workers=None):
+    """
+    Count all solutions with a bitmask search, splitting the work across a
+    process pool. explored_nodes counts queens placed and
+    checked_assignments the complete boards reached (before mirroring).
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    start = time.perf_counter()
+
+    tasks = symmetry_tasks(n)
+    prefixes = [prefix for prefix, _ in tasks]
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            results = list(pool.map(count_completions, [n] * len(tasks), prefixes))
+    else:
+        results = [count_completions(n, prefix) for prefix in prefixes]
+
+    valid_solutions = 0
+    checked_assignments = 0
+    explored_nodes = len({prefix[:i + 1] for prefix in prefixes for i in range(len(prefix))})
+    for (_, weight), (solutions, placements) in zip(tasks, results):
+        valid_solutions += weight * solutions
+        checked_assignments += solutions
+        explored_nodes += placements
+    solution = first_solution(n)
+    end = time.perf_counter()
+
+    return {
+        "method": "Bitmask counting (mirror symmetry)",
+        "N": n,
+        "solution": solution,
+        "valid_solutions": valid_solutions,
+        "explored_nodes": explored_nodes,
+        "checked_assignments": checked_assignments,
+        "runtime": end - start,
+    }
+
+
+__all__ = ["iter_naive", "solve_naive", "solve_counting"]
@@ -0,0 +1,48 @@
+from csp_engine import CSP, iter_backtracking, min_conflicts, solve_backtracking
+from csp_utils import attack_mask
+
+
+def nqueens_csp(n):
+    """
+    N-Queens as a generic CSP: variable c is the queen of column c, its
+    values are the rows 0..n-1 and every pair of columns is constrained.
+    """
+    full = (1 << n) - 1
+
+    def compatible(c1, r1, c2):
+        # rows of column c2 not attacked by the queen at (r1, c1)
+        return full & ~attack_mask(r1, abs(c1 - c2))
+
+    rows = range(n)
+    neighbors = [[c2 for c2 in rows if c2 != c1] for c1 in rows]
+    # a queen attacks at most 3 cells of another column
+    return CSP([rows] * n, neighbors, compatible=compatible, max_conflicts=3)
+
+
+def solve_engine_forward_checking(n):
+    res = solve_backtracking(nqueens_csp(n), "fc")
+    return dict(res, method="CSP engine: Backtracking + Forward Checking (MRV)", N=n)
+
+
+def solve_engine_ac3(n):
+    res = solve_backtracking(nqueens_csp(n), "ac3")
+    return dict(res, method="CSP engine: Backtracking + AC-3 (MRV)", N=n)
+
+
+def solve_engine_min_conflicts(n, max_steps=100000):
+    res = min_conflicts(nqueens_csp(n), max_steps)
+    return dict(res, method="CSP engine: Min-Conflicts local search", N=n)
+
+
+def iter_engine(n, inference="fc", metrics=None, deadline=None):
+    """iter_backtracking on the N-Queens model."""
+    return iter_backtracking(nqueens_csp(n), inference, metrics, deadline)
+
+
+__all__ = [
+    "nqueens_csp",
+    "iter_engine",
+    "solve_engine_forward_checking",
+    "solve_engine_ac3",
+    "solve_engine_min_conflicts",
+]
@@ -0,0 +1,125 @@
+import multiprocessing
+import os
+import queue
+import random
+import time
+
+from local_search import simulated_annealing, tabu_search
+from min_conflicts import min_conflicts
+
+STRATEGIES = {
+    "min-conflicts": min_conflicts,
+    "tabu": tabu_search,
+    "annealing": simulated_annealing,
+}
+COUNTERS = ["explored_nodes", "checked_assignments", "steps"]
+# Seconds between checks on the workers while waiting for their reports
+POLL_INTERVAL = 0.1
+
+
+def empty_report(index, strategy, seed):
+    report = {"worker": index, "strategy": strategy, "seed": seed,
+              "restarts": 0, "solved": False}
+    report.update((key, 0) for key in COUNTERS)
+    return report
+
+
+def portfolio_worker(index, strategy, n, seed, max_steps, max_restarts, stop, results):
+    # Runs in a worker process: restart the strategy until one run solves the
+    # board, max_restarts runs failed or stop is set, then report the totals
+    # (and the solution, if any)
+    random.seed(seed)
+    report = empty_report(index, strategy, seed)
+    start = time.perf_counter()
+    solution = None
+    while not stop.is_set() and (max_restarts is None or report["restarts"] < max_restarts):
+        res = STRATEGIES[strategy](n, max_steps, stop=stop)
+        report["restarts"] += 1
+        for key in COUNTERS:
+            report[key] += res[key]
+        if res["solution"] is not None:
+            solution = res["solution"]
+            report["solved"] = True
+            stop.set()
+            break
+    report["runtime"] = time.perf_counter() - start
+    results.put((report, solution))
+
+
+def solve_portfolio(n, workers=None, strategies=("min-conflicts",), max_steps=100000,
+                    seed=None, timeout=None, max_restarts=10):
+    """
+    Race independent local searches across worker processes. Worker i runs
+    strategies[i % len(strategies)] with seed + i, restarting after every
+    max_steps-step run that fails, up to max_restarts runs (None for no
+    limit). The first solution found wins and the other workers are stopped
+    through a shared Event; they finish the step they are on (checking every
+    1024 steps) and report their counts, which are summed into the result.
+    timeout (seconds) stops every worker. A worker that dies without
+    reporting is listed with its exit code and zero counts.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    unknown = [name for name in strategies if name not in STRATEGIES]
+    if unknown:
+        raise ValueError("unknown strategy: " + ", ".join(unknown))
+    if seed is None:
+        seed = random.randrange(2**32)
+    start = time.perf_counter()
+
+    ctx = multiprocessing.get_context()
+    stop = ctx.Event()
+    results = ctx.Queue()
+    procs = [
+        ctx.Process(target=portfolio_worker,
+                    args=(i, strategies[i % len(strategies)], n, seed + i,
+                          max_steps, max_restarts, stop, results))
+        for i in range(workers)
+    ]
+    for proc in procs:
+        proc.start()
+
+    reports = {}
+    exited = set() # workers seen dead before their report arrived
+    solution = None
+    winner = None
+    deadline = None if timeout is None else start + timeout
+    while len(reports) < workers:
+        if deadline is not None and not stop.is_set() and time.perf_counter() >= deadline:
+            stop.set() # out of time; the workers report what they did so far
+        try:
+            report, worker_solution = results.get(timeout=POLL_INTERVAL)
+        except queue.Empty:
+            # A worker still silent a poll after it exited will never report
+            for i, proc in enumerate(procs):
+                if i in reports or proc.is_alive():
+                    continue
+                if i in exited:
+                    reports[i] = empty_report(i, strategies[i % len(strategies)], seed + i)
+                    reports[i]["exitcode"] = proc.exitcode
+                exited.add(i)
+            continue
+        reports[report["worker"]] = report
+        if worker_solution is not None and solution is None:
+            solution = worker_solution
+            winner = report["worker"]
+    for proc in procs:
+        proc.join()
+    end = time.perf_counter()
+
+    reports = [reports[i] for i in range(workers)]
+    res = {
+        "method": f"Local search portfolio ({workers} workers: {', '.join(strategies)})",
+        "N": n,
+        "solution": solution,
+        "winner": winner,
+        "restarts": sum(report["restarts"] for report in reports),
+        "workers": reports,
+        "runtime": end - start,
+    }
+    for key in COUNTERS:
+        res[key] = sum(report[key] for report in reports)
+    return res
+
+
+__all__ = ["solve_portfolio", "STRATEGIES"]